@@ -1,12 +1,10 @@
 import discord
 from discord.ext import commands
 
-import os, sys
-from dotenv import load_dotenv
+import os, sys, time
 
-from main import colors
+from config import colors
 
-load_dotenv()
 ADMIN_ROLE_ID = int(os.getenv('ADMIN_ROLE'))
 
 class AdminCommands(commands.Cog):
@@ -14,8 +12,15 @@ class AdminCommands(commands.Cog):
         self.bot = bot
 
     @property
-    def player(self):
-        return getattr(self.bot, "player", None)
+    def players(self):
+        return getattr(self.bot, "players", None)
+
+    def get_player(self, ctx):
+        return self.players.get(ctx.guild.id)
+
+    @property
+    def upstream(self):
+        return getattr(self.bot, "upstream", None)
 
     @property
     def ffmpeg_path(self):
@@ -33,32 +38,26 @@ class AdminCommands(commands.Cog):
 
     @commands.command(name="leave", aliases=["disconnect", "dc"])
     async def leave(self, ctx):
+        player = self.get_player(ctx)
         vc = ctx.guild.voice_client
         if not vc:
             return await ctx.reply("Not in a vc.")
 
-        self.player.on_song_end()
-        self.player.on_vc_leave()
-        self.player.queue.clear()
-        self.player.current_song = None
-        self.player.is_playing = False
-        self.player.is_paused = False
+        player.clear()
+        player.on_vc_leave()
 
         await vc.disconnect()
         await ctx.send("Disconnected.")
 
     @commands.command(name="stop")
     async def stop(self, ctx):
+        player = self.get_player(ctx)
         vc = ctx.guild.voice_client
         if not vc:
             return await ctx.reply("Not connected to vc.")
 
-        self.player.on_song_end()
-        self.player.queue.clear()
-        self.player.current_song = None
-        self.player.is_playing = False
-        self.player.is_paused = False
-        self.player.radio_mode = False
+        player.clear()
+        player.radio_mode = False
         vc.stop()
 
         await ctx.send("Stopped and cleared all Player flags.")
@@ -67,13 +66,16 @@ class AdminCommands(commands.Cog):
     async def rst(self, ctx):
         await ctx.reply("OK")
 
-        if self.player:
-            await self.player.cleanup()
+        if self.players:
+            # save queues and positions so the new process can pick them back up
+            await self.players.checkpoint()
+            await self.players.cleanup()
 
         os.execv(sys.executable, [sys.executable] + sys.argv)
 
     @commands.command(name="debug")
     async def debug(self, ctx):
+        player = self.get_player(ctx)
         vc = ctx.guild.voice_client
         embed = discord.Embed(color=colors.main)
         embed.set_author(name="Music Debug Panel")
@@ -97,23 +99,30 @@ class AdminCommands(commands.Cog):
 
         embed.add_field(name="Voice Client", value=vc_info, inline=False)
 
-        if self.player.current_song:
-            song = self.player.current_song
+        if player.current_song:
+            song = player.current_song
+            loudness = self.bot.loudness
+            if song.path in loudness:
+                gain = f"{loudness.gain(song.path):+.1f} dB"
+            else:
+                gain = "measurement failed" if song.path in loudness.unmeasurable else "not measured"
             song_info = (
-                f"Name: `{song.get('name', 'Unknown')}`\n"
-                f"Category: `{song.get('category', 'Unknown')}`\n"
-                f"Duration: `{song.get('length', 'Unknown')}`\n"
-                f"Has Path: `{'path' in song}`"
+                f"Name: `{song.name}`\n"
+                f"Category: `{song.category or 'Unknown'}`\n"
+                f"Duration: `{song.length or 'Unknown'}`\n"
+                f"Has Path: `{song.path is not None}`\n"
+                f"From Radio: `{song.from_radio}`\n"
+                f"Gain: `{gain}`"
             )
         else:
             song_info = "No current song"
 
         embed.add_field(name="Current Song", value=song_info, inline=False)
 
-        queue_preview = list(self.player.queue)[:3]
+        queue_preview = list(player.queue)[:3]
         if queue_preview:
             preview_text = "\n".join(
-                f"{i+1}. {s.get('name', 'Unknown')}"
+                f"{i+1}. {s.name}"
                 for i, s in enumerate(queue_preview)
             )
         else:
@@ -122,7 +131,7 @@ class AdminCommands(commands.Cog):
         embed.add_field(
             name="Queue",
             value=(
-                f"Size: `{len(self.player.queue)}`\n"
+                f"Size: `{len(player.queue)}`\n"
                 f"Preview:\n{preview_text}"
             ),
             inline=False,
@@ -131,13 +140,95 @@ class AdminCommands(commands.Cog):
         embed.add_field(
             name="Player Flags",
             value=(
-                f"Playing: `{self.player.is_playing}`\n"
-                f"Paused: `{self.player.is_paused}`\n"
-                f"Radio Mode: `{self.player.radio_mode}`"
+                f"Playing: `{player.is_playing}`\n"
+                f"Paused: `{player.is_paused}`\n"
+                f"Radio Mode: `{player.radio_mode}`\n"
+                f"Scheduler: `{player.state}`, `{player.failures}` failures in a row\n"
+                f"Upstream: `{self.upstream.breaker.state}`"
+                + (f", retry in `{self.upstream.breaker.retry_in():.0f}s`" if self.upstream.breaker.is_open() else "")
             ),
             inline=False,
         )
 
+        if player.gaps:
+            gaps = [g * 1000 for g in player.gaps]
+            gap_text = (
+                f"Last: `{gaps[-1]:.0f} ms`\n"
+                f"Avg: `{sum(gaps) / len(gaps):.0f} ms` over {len(gaps)} changes\n"
+                f"Max: `{max(gaps):.0f} ms`"
+            )
+        else:
+            gap_text = "No track changes yet"
+
+        prefetch = player.prefetcher
+        cache = prefetch.cache
+        gap_text += (
+            f"\nPrefetch: `{'ready' if prefetch.ready else 'loading' if prefetch.path else 'idle'}`"
+            f"\nCache: `{cache.total / 1024 ** 2:.0f}/{cache.max_bytes / 1024 ** 2:.0f} MB`, "
+            f"`{len(cache.entries)}` tracks, `{cache.hits}` hits / `{cache.misses}` misses"
+        )
+
+        embed.add_field(name="Track Gap", value=gap_text, inline=False)
+
+        audio = player.audio_stats.summary()
+        if audio["frames"]:
+            audio_text = (
+                f"ffmpeg read: `{audio['read_p50'] * 1000:.1f} ms` p50, `{audio['read_p99'] * 1000:.1f} ms` p99, "
+                f"`{audio['read_max'] * 1000:.0f} ms` max (last {audio['frames']} frames)\n"
+                f"Send jitter: `{audio['jitter_p99'] * 1000:.1f} ms` p99, `{audio['late']}` late frames\n"
+                f"Underruns: `{audio['underruns']}`\n"
+                f"Reconnects: `{audio['reconnects']}`"
+            )
+            if player.audio_stats.last_message:
+                audio_text += f"\nLast ffmpeg message: `{player.audio_stats.last_message[:200]}`"
+        else:
+            audio_text = "Nothing played yet"
+
+        embed.add_field(name="Audio Send", value=audio_text, inline=False)
+
+        song_cache = getattr(self.bot, "song_cache", None)
+        if song_cache:
+            lookups = song_cache.hits + song_cache.misses
+            hit_rate = song_cache.hits / lookups * 100 if lookups else 0
+            embed.add_field(
+                name="Song Cache",
+                value=(
+                    f"Entries: `{len(song_cache)}` (`{song_cache.size / 1024 ** 2:.1f}/{song_cache.max_bytes / 1024 ** 2:.0f} MB`)\n"
+                    f"Hits: `{song_cache.hits}` Misses: `{song_cache.misses}` (`{hit_rate:.0f}%`)\n"
+                    f"Evictions: `{song_cache.evictions}`"
+                ),
+                inline=False,
+            )
+
+        song_index = getattr(self.bot, "song_index", None)
+        if song_index is not None:
+            embed.add_field(
+                name="Search Index",
+                value=(
+                    f"Songs: `{len(song_index)}`, `{len(song_index.grams)}` trigrams\n"
+                    f"Last build: `{song_index.build_seconds * 1000:.0f} ms`"
+                ),
+                inline=False,
+            )
+
+        watchdog = getattr(self.bot, "watchdog", None)
+        if watchdog is not None and watchdog.loop is not None:
+            loop = watchdog.summary()
+            loop_text = (
+                f"Lag: `{loop['p50'] * 1000:.1f} ms` p50, `{loop['p99'] * 1000:.1f} ms` p99, "
+                f"`{loop['max'] * 1000:.0f} ms` max (last {len(watchdog.lags)} probes)\n"
+                f"Stalls over `{watchdog.threshold * 1000:.0f} ms`: `{loop['stalls']}`"
+            )
+            if watchdog.stalls:
+                stall = watchdog.stalls[-1]
+                loop_text += (
+                    f"\nLast stall: `{stall.lag * 1000:.0f} ms` {int(time.time() - stall.at)}s ago "
+                    f"in `{stall.task}` at `{stall.site}`"
+                )
+            if watchdog.last_cross_thread:
+                loop_text += f"\nCross-thread calls: `{loop['cross_thread']}`, last `{watchdog.last_cross_thread}`"
+            embed.add_field(name="Event Loop", value=loop_text, inline=False)
+
         await ctx.reply(embed=embed)
 
     @commands.Cog.listener()
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import discord
+
+import metrics
+
+# discord allows 5 messages per 5s per channel, stay under it so command replies don't get queued behind us
+MIN_INTERVAL = 1.0
+# a newer now playing edits the last one instead of posting again if nothing else was said in between
+EDIT_WINDOW = 60
+
+Render = Callable[[], Awaitable[dict]]
+
+
+class Channel:
+    __slots__ = ("items", "task", "next_send", "last_np", "last_np_at")
+
+    def __init__(self):
+        # ("np", render) or ("notice", content)
+        self.items = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.next_send = 0.0
+        self.last_np: Optional[discord.Message] = None
+        self.last_np_at = 0.0
+
+
+class Announcer:
+    def __init__(self, min_interval: float = MIN_INTERVAL, edit_window: float = EDIT_WINDOW):
+        self.min_interval = min_interval
+        self.edit_window = edit_window
+        self.channels: dict[int, Channel] = {}
+
+    def now_playing(self, channel, render: Render):
+        # render builds the message kwargs when it's actually sent, so a skipped track never costs a lookup
+        state = self._state(channel.id)
+        stale = [item for item in state.items if item[0] == "np"]
+        for item in stale:
+            state.items.remove(item)
+            metrics.announcements_total.inc(outcome="coalesced")
+        state.items.append(("np", render))
+        self._wake(channel, state)
+
+    def notice(self, channel, content: str):
+        state = self._state(channel.id)
+        state.items.append(("notice", content))
+        self._wake(channel, state)
+
+    def pending(self) -> int:
+        return sum(len(state.items) for state in self.channels.values())
+
+    def _state(self, channel_id: int) -> Channel:
+        state = self.channels.get(channel_id)
+        if state is None:
+            state = self.channels[channel_id] = Channel()
+        return state
+
+    def _wake(self, channel, state: Channel):
+        if state.task is None or state.task.done():
+            state.task = asyncio.create_task(self._run(channel, state))
+
+    async def _run(self, channel, state: Channel):
+        while state.items:
+            wait = state.next_send - time.monotonic()
+            if wait > 0:
+                # anything queued while we wait gets coalesced into this send
+                await asyncio.sleep(wait)
+                continue
+
+            kind, value = state.items.popleft()
+            try:
+                if kind == "np":
+                    await self._send_now_playing(channel, state, await value())
+                else:
+                    await channel.send(value)
+                    metrics.announcements_total.inc(outcome="sent")
+            except Exception as e:
+                print(f"Announce error in {channel.id}: {e}")
+                metrics.announcements_total.inc(outcome="failed")
+
+            state.next_send = time.monotonic() + self.min_interval
+
+        if not state.last_np and self.channels.get(channel.id) is state:
+            del self.channels[channel.id]
+
+    async def _send_now_playing(self, channel, state: Channel, kwargs: dict):
+        last = state.last_np
+        if (
+            last
+            and time.monotonic() - state.last_np_at < self.edit_window
+            and getattr(channel, "last_message_id", None) == last.id
+        ):
+            try:
+                await last.edit(**kwargs)
+                state.last_np_at = time.monotonic()
+                metrics.announcements_total.inc(outcome="edited")
+                return
+            except discord.NotFound:
+                pass
+
+        state.last_np = await channel.send(**kwargs)
+        state.last_np_at = time.monotonic()
+        metrics.announcements_total.inc(outcome="sent")
+
+    def close(self):
+        for state in self.channels.values():
+            if state.task:
+                state.task.cancel()
+        self.channels.clear()
@@ -0,0 +1,296 @@
+import asyncio
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Optional
+
+import discord
+
+import metrics
+import startup
+from config import FFMPEG_DIR
+
+# shoutout google for this config :sob:
+STREAM_BEFORE_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+
+# song path -> (codec, bitrate), probing a file once is enough
+_probes: OrderedDict[str, tuple] = OrderedDict()
+MAX_PROBES = 5000
+
+
+# (path,) once discovery has run, path is None when the system ffmpeg should be used
+_ffmpeg: Optional[tuple] = None
+_ffmpeg_lock = threading.Lock()
+
+
+def _discover_ffmpeg() -> Optional[str]:
+    try:
+        from local_ffmpeg import install, is_installed
+
+        if not is_installed(path=FFMPEG_DIR):
+            print("Installing FFmpeg...")
+            success, message = install(path=FFMPEG_DIR)
+            print(message if success else f"FFmpeg install failed: {message}")
+
+        path = os.path.join(FFMPEG_DIR, "ffmpeg.exe" if sys.platform == "win32" else "ffmpeg")
+        if os.path.exists(path):
+            return path
+
+    except Exception as e:
+        print(f"FFmpeg setup error: {e}")
+
+    print("Using system FFmpeg")
+    return None
+
+
+def find_ffmpeg() -> Optional[str]:
+    # blocking (it may download ffmpeg), main kicks it off in a thread at startup so it's usually done by the first play
+    global _ffmpeg
+    with _ffmpeg_lock:
+        if _ffmpeg is None:
+            with startup.step("ffmpeg discovery"):
+                _ffmpeg = (_discover_ffmpeg(),)
+        return _ffmpeg[0]
+
+
+async def get_ffmpeg() -> Optional[str]:
+    if _ffmpeg is not None:
+        return _ffmpeg[0]
+    return await asyncio.to_thread(find_ffmpeg)
+
+
+def ffprobe_for(ffmpeg_path: Optional[str]) -> str:
+    if not ffmpeg_path:
+        return "ffprobe"
+
+    name = "ffprobe.exe" if sys.platform == "win32" else "ffprobe"
+    probe = os.path.join(os.path.dirname(ffmpeg_path), name)
+    return probe if os.path.exists(probe) else ffmpeg_path
+
+
+def channel_bitrate(vc) -> int:
+    # FFmpegOpusAudio takes kbps, discord voice channels go from 8 to 384
+    bitrate = getattr(getattr(vc, "channel", None), "bitrate", None) or 64000
+    return max(8, min(bitrate // 1000, 512))
+
+
+async def probe(source: str, path: str, ffmpeg_path: Optional[str]):
+    if path in _probes:
+        _probes.move_to_end(path)
+        return _probes[path]
+
+    try:
+        result = await discord.FFmpegOpusAudio.probe(source, method="native", executable=ffprobe_for(ffmpeg_path))
+    except Exception as e:
+        print(f"Probe error for {path}: {e}")
+        return None, None
+
+    _probes[path] = result
+    if len(_probes) > MAX_PROBES:
+        _probes.popitem(last=False)
+    return result
+
+
+FRAME = 0.02
+# a minute of frames
+STATS_WINDOW = 3000
+# the voice thread stops reading while paused or reconnecting, a gap this long starts the cadence over
+RESYNC_GAP = 1.0
+# printed by ffmpeg's http reader before it reopens a dropped stream
+_RECONNECT = re.compile(r"Will reconnect at \d+")
+
+
+class StreamStats:
+    # one per guild player, written by the voice and ffmpeg stderr threads, read by ..debug and the summary loop
+    def __init__(self):
+        # seconds each read from ffmpeg took
+        self.reads = deque(maxlen=STATS_WINDOW)
+        # how far each read was from 20ms after the previous one
+        self.jitter = deque(maxlen=STATS_WINDOW)
+        self.frames = 0
+        self.underruns = 0
+        self.late = 0
+        self.reconnects = 0
+        self.last_message: Optional[str] = None
+        self._last_read: Optional[float] = None
+        self._reported = (0, 0, 0, 0)
+
+    def frame(self, started: float, finished: float):
+        latency = finished - started
+        self.frames += 1
+        self.reads.append(latency)
+        metrics.audio_read_seconds.observe(latency)
+        # ffmpeg didn't have the next frame ready in time for its slot
+        if latency > FRAME:
+            self.underruns += 1
+            metrics.audio_underruns_total.inc()
+
+        if self._last_read is not None and started - self._last_read < RESYNC_GAP:
+            drift = started - self._last_read - FRAME
+            self.jitter.append(abs(drift))
+            metrics.audio_send_jitter_seconds.observe(abs(drift))
+            if drift > FRAME:
+                self.late += 1
+                metrics.audio_late_frames_total.inc()
+        self._last_read = started
+
+    def restart(self):
+        self._last_read = None
+
+    def ffmpeg_line(self, line: str):
+        self.last_message = line
+        if _RECONNECT.search(line):
+            self.reconnects += 1
+            metrics.ffmpeg_reconnects_total.inc()
+
+    def summary(self) -> dict:
+        reads = sorted(self.reads)
+        jitter = sorted(self.jitter)
+        return {
+            "frames": len(reads),
+            "read_p50": _percentile(reads, 50),
+            "read_p99": _percentile(reads, 99),
+            "read_max": reads[-1] if reads else 0.0,
+            "jitter_p99": _percentile(jitter, 99),
+            "underruns": self.underruns,
+            "late": self.late,
+            "reconnects": self.reconnects,
+        }
+
+    def counts_since_report(self) -> tuple:
+        # (frames, underruns, late frames, reconnects) since the last call
+        counts = (self.frames, self.underruns, self.late, self.reconnects)
+        since = tuple(now - before for now, before in zip(counts, self._reported))
+        self._reported = counts
+        return since
+
+
+def _percentile(values: list, p: int) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+
+class FFmpegLog:
+    # py-cord reads a piped stderr in 8KB blocks, so a reconnect would only show up once the track ends.
+    # ffmpeg gets the write end of our own pipe instead and this thread reads it line by line
+    def __init__(self, stats: StreamStats):
+        self.stats = stats
+        read_fd, write_fd = os.pipe()
+        self.reader = os.fdopen(read_fd, "rb")
+        self.writer = os.fdopen(write_fd, "wb")
+
+    def start(self):
+        # ffmpeg has its own copy now, closing ours lets the reader see EOF when it exits
+        self.writer.close()
+        threading.Thread(target=self._run, name="ffmpeg-stderr", daemon=True).start()
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+    def _run(self):
+        with self.reader:
+            for raw in self.reader:
+                line = raw.decode("utf-8", "replace").strip()
+                if line:
+                    self.stats.ffmpeg_line(line)
+
+
+class TimedSource(discord.AudioSource):
+    def __init__(self, source: discord.AudioSource, on_first_frame: Callable[[], None], stats: Optional[StreamStats] = None):
+        self.source = source
+        self._on_first_frame = on_first_frame
+        self.stats = stats
+        # 20ms each, counts what was actually handed to discord so pauses don't move the position
+        self.frames = 0
+        if stats:
+            stats.restart()
+
+    def read(self) -> bytes:
+        started = time.perf_counter()
+        data = self.source.read()
+        # the first read waits on ffmpeg starting up, time to first audio already covers that
+        if data and self.stats and self.frames:
+            self.stats.frame(started, time.perf_counter())
+        if data:
+            self.frames += 1
+        if data and self._on_first_frame:
+            callback, self._on_first_frame = self._on_first_frame, None
+            try:
+                callback()
+            except Exception as e:
+                print(f"First frame callback error: {e}")
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.source.cleanup()
+
+
+async def build_source(
+    source: str,
+    path: str,
+    vc,
+    ffmpeg_path: Optional[str],
+    stream: bool,
+    mode: str = "opus",
+    start: float = 0,
+    gain: float = 0,
+    stats: Optional[StreamStats] = None,
+):
+    before_options = STREAM_BEFORE_OPTIONS if stream else ""
+    if start > 0:
+        before_options = f"{before_options} -ss {start:.2f}".strip()
+
+    options = "-vn"
+    if gain:
+        options += f" -af volume={gain:.2f}dB"
+
+    if mode == "pcm":
+        return _spawn(
+            discord.FFmpegPCMAudio,
+            stats,
+            source,
+            executable=ffmpeg_path or "ffmpeg",
+            before_options=before_options,
+            options=options,
+        )
+
+    # a gain means re-encoding anyway, so there's nothing to probe for
+    codec = None
+    if not gain:
+        # probing a remote stream costs another http round trip, so only local files get probed up front
+        codec = _probes.get(path, (None, None))[0]
+        if codec is None and not stream:
+            codec, _ = await probe(source, path, ffmpeg_path)
+
+    return _spawn(
+        discord.FFmpegOpusAudio,
+        stats,
+        source,
+        codec=codec,
+        bitrate=channel_bitrate(vc),
+        executable=ffmpeg_path or "ffmpeg",
+        before_options=before_options,
+        options=options,
+    )
+
+
+def _spawn(cls, stats: Optional[StreamStats], source: str, **kwargs):
+    if stats is None:
+        return cls(source, **kwargs)
+
+    log = FFmpegLog(stats)
+    try:
+        audio = cls(source, stderr=log.writer, **kwargs)
+    except Exception:
+        log.close()
+        raise
+    log.start()
+    return audio
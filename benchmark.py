@@ -0,0 +1,397 @@
+# Offline benchmark for search, autocomplete, radio and time-to-first-audio.
+# Runs a fake JuiceWRLDAPI in-process and a fake voice client that pulls frames every 20ms like the real one.
+#
+#   python benchmark.py --iterations 50 --latency 40 --fail-rate 0.05
+#
+# Needs ffmpeg on PATH (or the local-ffmpeg install) since play_next spawns it for real.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+from aiohttp import web
+
+CATEGORIES = ["released", "unreleased", "unreleased", "unsurfaced", "recording_session"]
+ERAS = ["JW 999", "GB&GR", "DRFL", "WOD", "LND", "TPNE"]
+FRAME = 0.02
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def make_audio(ffmpeg: str, dest: str, seconds: float):
+    subprocess.run(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+         "-c:a", "libmp3lame", "-b:a", "128k", dest],
+        check=True,
+    )
+
+
+class FakeAPI:
+    def __init__(self, songs: int, audio: bytes, latency: float, jitter: float, fail_rate: float, page_size: int = 20):
+        self.audio = audio
+        self.latency = latency
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.page_size = page_size
+        self.requests = 0
+        self.failures = 0
+
+        rng = random.Random(999)
+        self.songs = {}
+        for i in range(1, songs + 1):
+            song = {
+                "id": i,
+                "name": f"Song {i}",
+                "category": rng.choice(CATEGORIES),
+                "era": {"name": rng.choice(ERAS)},
+                "length": "3:00",
+                "producers": "Nick Mira",
+                "lyrics": "la la la\n" * rng.randint(10, 200),
+            }
+            # some entries have no file, like the real api
+            if rng.random() > 0.1:
+                song["path"] = f"Compilation/Song {i}.mp3"
+            self.songs[i] = song
+
+    async def _delay(self):
+        self.requests += 1
+        await asyncio.sleep(max(0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.fail_rate:
+            self.failures += 1
+            return web.Response(status=503)
+        return None
+
+    async def song_list(self, request):
+        failed = await self._delay()
+        if failed:
+            return failed
+
+        results = list(self.songs.values())
+        search = request.query.get("search")
+        if search:
+            results = [s for s in results if search.lower() in s["name"].lower()]
+
+        page = int(request.query.get("page", 1))
+        start = (page - 1) * self.page_size
+        chunk = results[start:start + self.page_size]
+        if not chunk and page > 1:
+            return web.Response(status=404)
+
+        return web.json_response({
+            "count": len(results),
+            "next": None if start + self.page_size >= len(results) else f"?page={page + 1}",
+            "results": chunk,
+        })
+
+    async def song(self, request):
+        failed = await self._delay()
+        if failed:
+            return failed
+
+        song = self.songs.get(int(request.match_info["song_id"]))
+        if not song:
+            return web.Response(status=404)
+        return web.json_response(song)
+
+    async def download(self, request):
+        failed = await self._delay()
+        if failed:
+            return failed
+
+        resp = web.StreamResponse()
+        resp.content_type = "audio/mpeg"
+        resp.content_length = len(self.audio)
+        await resp.prepare(request)
+        for i in range(0, len(self.audio), 64 * 1024):
+            await resp.write(self.audio[i:i + 64 * 1024])
+        return resp
+
+    async def start(self, port: int):
+        app = web.Application()
+        app.router.add_get("/juicewrld/songs/", self.song_list)
+        app.router.add_get("/juicewrld/songs/{song_id}/", self.song)
+        app.router.add_get("/juicewrld/files/download/", self.download)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", port).start()
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class FakeVoiceClient:
+    def __init__(self):
+        self.channel = SimpleNamespace(bitrate=96000, name="benchmark", members=[])
+        self.tracks = []
+        self.first_frame = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_connected(self):
+        return True
+
+    def is_playing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def is_paused(self):
+        return False
+
+    def play(self, source, *, after=None):
+        track = {"play": time.perf_counter(), "first": None, "end": None, "frames": 0}
+        self.tracks.append(track)
+        self._stop.clear()
+        self.first_frame.clear()
+
+        def run():
+            start = time.perf_counter()
+            while not self._stop.is_set():
+                data = source.read()
+                if not data:
+                    break
+
+                now = time.perf_counter()
+                if track["first"] is None:
+                    track["first"] = now
+                    self.first_frame.set()
+                track["frames"] += 1
+
+                # same pacing as discord's AudioPlayer
+                delay = start + FRAME * track["frames"] - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            track["end"] = time.perf_counter()
+            source.cleanup()
+            if after:
+                after(None)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+async def wait_for(event: threading.Event, timeout: float) -> bool:
+    return await asyncio.to_thread(event.wait, timeout)
+
+
+async def bench_search(main, iterations: int):
+    player = main.players.get(1)
+    samples = []
+    for _ in range(iterations):
+        main.song_cache.clear()
+        query = f"Song {random.randint(1, 50)}"
+        start = time.perf_counter()
+        await player.search_song(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_index(main, iterations: int):
+    player = main.players.get(1)
+    samples = []
+    for _ in range(iterations):
+        # a dropped letter, like a typo in ..play
+        query = f"Sng {random.randint(1, 50)}"
+        start = time.perf_counter()
+        player.find_songs(query)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_autocomplete(main, iterations: int):
+    import commands
+
+    samples = []
+    for _ in range(iterations):
+        # what discord sends while someone types: short prefixes, whole titles and the odd typo
+        title = f"song {random.randint(1, 3000)}"
+        value = random.choice([title[:random.randint(1, len(title))], title, f"sng {random.randint(1, 50)}"])
+        ctx = SimpleNamespace(value=value, bot=main.bot)
+        start = time.perf_counter()
+        await commands.song_choices(ctx)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_radio(main, iterations: int):
+    player = main.players.get(1)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await player.get_radio_song()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def bench_ttfa(main, api: FakeAPI, iterations: int):
+    vc = FakeVoiceClient()
+    ctx = SimpleNamespace(guild=SimpleNamespace(id=2, voice_client=vc), channel=SimpleNamespace(id=0))
+    player = main.players.get(2)
+    playable = [s for s in api.songs.values() if s.get("path") and s["category"] in ("released", "unreleased")]
+
+    samples = []
+    for i in range(iterations):
+        song = dict(random.choice(playable))
+        # unique path so every iteration is a cold, streamed play
+        song["path"] = f"{song['path']}?ttfa={i}"
+
+        player.add_to_queue(song)
+        start = time.perf_counter()
+        await player.play_next(ctx)
+
+        if await wait_for(vc.first_frame, 15):
+            samples.append(vc.tracks[-1]["first"] - start)
+        else:
+            print(f"ttfa iteration {i}: no audio")
+
+        vc.stop()
+        while player.is_playing:
+            await asyncio.sleep(0.01)
+
+    return samples
+
+
+async def bench_gaps(main, api: FakeAPI, tracks: int):
+    vc = FakeVoiceClient()
+    ctx = SimpleNamespace(guild=SimpleNamespace(id=3, voice_client=vc), channel=SimpleNamespace(id=0))
+    player = main.players.get(3)
+    playable = [s for s in api.songs.values() if s.get("path") and s["category"] in ("released", "unreleased")]
+
+    for song in random.sample(playable, min(tracks, len(playable))):
+        player.add_to_queue(dict(song))
+
+    await player.play_next(ctx)
+    deadline = time.perf_counter() + tracks * 30
+    while player.is_playing and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+    done = [t for t in vc.tracks if t["first"] and t["end"]]
+    return [b["first"] - a["end"] for a, b in zip(done, done[1:])]
+
+
+def report(name: str, samples, unit: float = 1000):
+    if not samples:
+        print(f"{name:<24} no samples")
+        return None
+
+    p50, p95, p99 = (percentile(samples, p) * unit for p in (50, 95, 99))
+    print(f"{name:<24} n={len(samples):<5} p50={p50:8.1f}ms  p95={p95:8.1f}ms  p99={p99:8.1f}ms")
+    return {"n": len(samples), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+async def run(args):
+    port = free_port()
+    data_dir = tempfile.mkdtemp(prefix="wrld-bench-")
+    os.environ["JUICEWRLD_API"] = f"http://127.0.0.1:{port}/juicewrld"
+    os.environ["WRLD_DATA_DIR"] = data_dir
+    os.environ["AUDIO_MODE"] = args.mode
+
+    try:
+        import main
+
+        main.setup()
+        main.bot.loop = asyncio.get_running_loop()
+        main.watchdog.start(main.bot.loop)
+        ffmpeg = main.find_ffmpeg() or shutil.which("ffmpeg")
+        if not ffmpeg:
+            print("ffmpeg not found")
+            return 1
+
+        if args.audio:
+            with open(args.audio, "rb") as f:
+                audio = f.read()
+        else:
+            dest = os.path.join(data_dir, "track.mp3")
+            make_audio(ffmpeg, dest, args.track_seconds)
+            with open(dest, "rb") as f:
+                audio = f.read()
+
+        api = FakeAPI(args.songs, audio, args.latency / 1000, args.jitter / 1000, args.fail_rate)
+        await api.start(port)
+
+        if args.warm_catalog:
+            await main.catalog.sync(main.upstream)
+            await main.radio_pool.refill()
+            await main.song_index.refresh(main.catalog)
+
+        print(f"latency={args.latency}ms jitter={args.jitter}ms fail_rate={args.fail_rate} mode={args.mode} "
+              f"catalog={'warm' if args.warm_catalog else 'cold'}")
+
+        results = {
+            "search_song": report("search_song", await bench_search(main, args.iterations)),
+            "song_index_search": report("song_index_search", await bench_index(main, args.iterations)),
+            "autocomplete": report("autocomplete", await bench_autocomplete(main, args.iterations)),
+            "get_radio_song": report("get_radio_song", await bench_radio(main, args.iterations)),
+            "time_to_first_audio": report("time_to_first_audio", await bench_ttfa(main, api, args.iterations)),
+            "inter_track_gap": report("inter_track_gap", await bench_gaps(main, api, args.tracks)),
+        }
+        print(f"upstream requests={api.requests} injected failures={api.failures}")
+        loop = main.watchdog.summary()
+        print(f"loop lag p99={loop['p99'] * 1000:.1f}ms max={main.watchdog.max_lag * 1000:.1f}ms "
+              f"stalls={loop['stalls']} cross-thread calls={loop['cross_thread']}")
+        print(main.audio_report() or "Audio: no frames sent")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+
+        await main.players.cleanup()
+        main.loudness.close()
+        main.watchdog.stop()
+        await main.upstream.close()
+        await api.stop()
+
+        ttfa = results["time_to_first_audio"]
+        if args.max_ttfa_p95 and ttfa and ttfa["p95_ms"] > args.max_ttfa_p95:
+            print(f"time_to_first_audio p95 {ttfa['p95_ms']:.1f}ms is over the {args.max_ttfa_p95}ms budget")
+            return 1
+        return 0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="WRLD 2 offline playback benchmark")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--tracks", type=int, default=5, help="tracks queued back to back for the gap test")
+    parser.add_argument("--songs", type=int, default=500, help="songs in the fake catalog")
+    parser.add_argument("--latency", type=float, default=50, help="fake api latency in ms")
+    parser.add_argument("--jitter", type=float, default=10, help="+/- latency jitter in ms")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="chance of a 503 per request")
+    parser.add_argument("--track-seconds", type=float, default=2.0)
+    parser.add_argument("--audio", help="audio file to serve instead of a generated tone")
+    parser.add_argument("--mode", choices=("opus", "pcm"), default="opus")
+    parser.add_argument("--warm-catalog", action="store_true", help="sync the catalog mirror before measuring")
+    parser.add_argument("--max-ttfa-p95", type=float, help="exit 1 if time-to-first-audio p95 is over this many ms")
+    parser.add_argument("--json", help="also write results to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
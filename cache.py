@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import os
+import stat
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import metrics
+from config import DATA_DIR
+from upstream import UpstreamClient, download_url
+
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+STALE_PART = 3600
+
+
+def cache_key(path: str) -> str:
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    def __init__(self, client: UpstreamClient, directory: str = CACHE_DIR, max_bytes: int = 2 * 1024 ** 3, chunk_size: int = 64 * 1024):
+        self.client = client
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+
+        # key -> size, oldest first
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.downloads: dict[str, asyncio.Task] = {}
+        # called with (song path, local file) whenever a download lands
+        self.on_cached: Optional[Callable[[str, str], None]] = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        found = []
+        for name in os.listdir(self.directory):
+            file = os.path.join(self.directory, name)
+
+            try:
+                st = os.stat(file)
+            except OSError:
+                continue
+            # cluster workers keep their own caches in subdirectories
+            if not stat.S_ISREG(st.st_mode):
+                continue
+
+            # leftovers from a download that never finished (crash, kill, etc).
+            # recent ones may still be being written if the previous process is shutting down
+            if name.endswith(".part"):
+                if time.time() - st.st_mtime > STALE_PART:
+                    _remove(file)
+                continue
+            found.append((st.st_mtime, name, st.st_size))
+
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.total += size
+
+        self._evict()
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total -= size
+            _remove(self._file(key))
+
+    def __contains__(self, path: str):
+        return cache_key(path) in self.entries
+
+    def get(self, path: str) -> Optional[str]:
+        key = cache_key(path)
+        if key not in self.entries:
+            self.misses += 1
+            return None
+
+        file = self._file(key)
+        if not os.path.exists(file):
+            self.total -= self.entries.pop(key)
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        try:
+            # mtime doubles as the lru order across restarts
+            os.utime(file)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return file
+
+    def fetch(self, path: str) -> Optional[asyncio.Task]:
+        key = cache_key(path)
+        if key in self.entries:
+            return None
+
+        task = self.downloads.get(key)
+        if task is None:
+            task = asyncio.create_task(self._download(path, key))
+            self.downloads[key] = task
+            task.add_done_callback(lambda _: self.downloads.pop(key, None))
+        return task
+
+    async def _download(self, path: str, key: str):
+        part = os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.part")
+
+        try:
+            session = await self.client.get_session()
+            async with session.get(download_url(path), timeout=self.client.stream_timeout) as resp:
+                metrics.upstream_responses_total.inc(endpoint="download", status=resp.status)
+                if resp.status != 200:
+                    print(f"Cache download failed for {path}: {resp.status}")
+                    return
+
+                with open(part, "wb") as f:
+                    async for chunk in resp.content.iter_chunked(self.chunk_size):
+                        f.write(chunk)
+
+            size = os.path.getsize(part)
+            if size > self.max_bytes:
+                return
+
+            os.replace(part, self._file(key))
+            if key in self.entries:
+                self.total -= self.entries.pop(key)
+            self.entries[key] = size
+            self.total += size
+            self._evict()
+
+            if self.on_cached and key in self.entries:
+                self.on_cached(path, self._file(key))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.upstream_responses_total.inc(endpoint="download", status="error")
+            print(f"Cache download error for {path}: {e}")
+        finally:
+            _remove(part)
+
+    def cancel_downloads(self):
+        for task in list(self.downloads.values()):
+            task.cancel()
+
+
+def _remove(file: str):
+    try:
+        os.remove(file)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Failed to remove {file}: {e}")
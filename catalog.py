@@ -0,0 +1,315 @@
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config import DATA_DIR
+from upstream import UpstreamClient, SONGS_URL
+
+DB_PATH = os.path.join(DATA_DIR, "catalog.db")
+
+
+class Catalog:
+    def __init__(self, path: str = DB_PATH, max_age: int = 3600, full_sync_interval: int = 86400, concurrency: int = 4):
+        self.max_age = max_age
+        self.full_sync_interval = full_sync_interval
+        self.concurrency = concurrency
+        self.syncing = False
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS songs (
+                id INTEGER PRIMARY KEY,
+                name TEXT,
+                category TEXT,
+                era TEXT,
+                path TEXT,
+                data TEXT NOT NULL,
+                synced_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_songs_category ON songs (category);
+            CREATE INDEX IF NOT EXISTS idx_songs_era ON songs (era);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+        meta = self._meta()
+        self.last_full_sync = meta.get("last_full_sync", 0.0)
+        self.last_sync = meta.get("last_sync", 0.0)
+        self.upstream_count = int(meta.get("upstream_count", 0))
+        self.size = self._conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    def reload(self):
+        # another cluster worker owns syncing, pick up what it wrote
+        with self._lock:
+            meta = self._meta()
+            self.last_full_sync = meta.get("last_full_sync", 0.0)
+            self.last_sync = meta.get("last_sync", 0.0)
+            self.upstream_count = int(meta.get("upstream_count", 0))
+            self.size = self._conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    @property
+    def warm(self):
+        return self.size > 0 and self.last_full_sync > 0
+
+    def is_fresh(self):
+        return self.warm and time.time() - self.last_sync < self.max_age
+
+    def _meta(self):
+        rows = self._conn.execute("SELECT key, value FROM meta").fetchall()
+        return {row["key"]: row["value"] for row in rows}
+
+    def _set_meta(self, **values):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            list(values.items()),
+        )
+
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _upsert(self, songs: list, synced_at: float):
+        rows = []
+        for song in songs:
+            if not isinstance(song, dict) or "id" not in song:
+                continue
+
+            era = song.get("era")
+            rows.append((
+                int(song["id"]),
+                song.get("name"),
+                (song.get("category") or "").lower(),
+                era.get("name") if isinstance(era, dict) else None,
+                song.get("path") or None,
+                json.dumps(song),
+                synced_at,
+            ))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO songs (id, name, category, era, path, data, synced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def _finish_sync(self, full: bool, started: float, count: int):
+        with self._lock:
+            if full:
+                # anything not seen during a full walk was removed upstream
+                self._conn.execute("DELETE FROM songs WHERE synced_at < ?", (started,))
+                self.last_full_sync = started
+
+            self.last_sync = started
+            self.upstream_count = count
+            self._set_meta(last_full_sync=self.last_full_sync, last_sync=started, upstream_count=count)
+            self._conn.commit()
+            self.size = self._conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+    async def get(self, song_id) -> Optional[dict]:
+        try:
+            song_id = int(song_id)
+        except (TypeError, ValueError):
+            return None
+
+        rows = await asyncio.to_thread(self._query, "SELECT data FROM songs WHERE id = ?", (song_id,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    async def filter(self, categories=None, era: str = None, playable: bool = False, limit: int = None) -> list:
+        # only the fields a queue entry needs, a whole category's full json (lyrics included) is megabytes
+        sql = "SELECT id, name, category, era, path, json_extract(data, '$.length') AS length FROM songs WHERE 1=1"
+        params = []
+
+        if categories:
+            sql += f" AND category IN ({', '.join('?' for _ in categories)})"
+            params.extend(c.lower() for c in categories)
+        if era:
+            sql += " AND era = ? COLLATE NOCASE"
+            params.append(era)
+        if playable:
+            sql += " AND path IS NOT NULL"
+
+        sql += " ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        return await asyncio.to_thread(self._entries, sql, params)
+
+    def _entries(self, sql: str, params) -> list:
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "category": row["category"],
+                "era": {"name": row["era"]} if row["era"] else None,
+                "path": row["path"],
+                "length": row["length"],
+            }
+            for row in self._query(sql, params)
+        ]
+
+    async def titles(self, since: float = 0.0) -> list:
+        # just what the search index needs, without loading every song's full json (lyrics included)
+        return await asyncio.to_thread(
+            self._query,
+            "SELECT id, name, category, era, path, json_extract(data, '$.track_titles') AS track_titles, synced_at "
+            "FROM songs WHERE synced_at > ?",
+            (since,),
+        )
+
+    async def playable_ids(self, categories) -> list:
+        sql = (
+            f"SELECT id FROM songs WHERE category IN ({', '.join('?' for _ in categories)}) "
+            "AND path IS NOT NULL"
+        )
+        rows = await asyncio.to_thread(self._query, sql, [c.lower() for c in categories])
+        return [row["id"] for row in rows]
+
+    async def iter_songs(
+        self,
+        client: UpstreamClient,
+        category: str = None,
+        era: str = None,
+        search: str = None,
+        playable=None,
+        limit: int = None,
+    ):
+        # the mirror can answer category/era filters by itself, searches (or a cold mirror) stream from the api.
+        # playable lists the categories worth queueing, the mirror leaves out the rest and songs without a file in sql
+        if self.is_fresh() and not search:
+            categories = [category] if category else None
+            if playable:
+                categories = [c for c in categories or playable if c.lower() in playable]
+                if not categories:
+                    return
+
+            for song in await self.filter(categories=categories, era=era, playable=bool(playable), limit=limit):
+                yield song
+            return
+
+        params = {}
+        if category:
+            params["category"] = category
+        if era:
+            params["era"] = era
+        if search:
+            params["search"] = search
+
+        async for song in stream_songs(client, params, self.concurrency):
+            # the api may ignore filters it doesn't know, so check them here too
+            if category and (song.get("category") or "").lower() != category.lower():
+                continue
+            song_era = song.get("era")
+            if era and (not isinstance(song_era, dict) or (song_era.get("name") or "").lower() != era.lower()):
+                continue
+            yield song
+
+    async def _fetch_page(self, client: UpstreamClient, page: int):
+        data = await client.get_json(SONGS_URL, params={"page": page})
+        if not isinstance(data, dict):
+            raise RuntimeError(f"page {page} returned nothing")
+        return data
+
+    async def _fetch_pages(self, client: UpstreamClient, pages, synced_at: float):
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def worker(page):
+            async with sem:
+                data = await self._fetch_page(client, page)
+            return await asyncio.to_thread(self._upsert, data.get("results") or [], synced_at)
+
+        results = await asyncio.gather(*(worker(p) for p in pages))
+        return sum(results)
+
+    async def sync(self, client: UpstreamClient):
+        if self.syncing:
+            return
+        self.syncing = True
+
+        started = time.time()
+        full = not self.warm or started - self.last_full_sync > self.full_sync_interval
+
+        try:
+            first = await self._fetch_page(client, 1)
+            count = first.get("count")
+            results = first.get("results") or []
+            if not isinstance(count, int) or not results:
+                print("Catalog sync: unexpected songs response")
+                return
+
+            page_size = len(results)
+            pages = math.ceil(count / page_size)
+
+            if full:
+                synced = await asyncio.to_thread(self._upsert, results, started)
+                synced += await self._fetch_pages(client, range(2, pages + 1), started)
+            else:
+                # new songs are appended, so only the pages past what we already have can change
+                start_page = max(2, math.ceil(max(self.upstream_count, 1) / page_size))
+                synced = await asyncio.to_thread(self._upsert, results, started)
+                if count > self.upstream_count:
+                    synced += await self._fetch_pages(client, range(start_page, pages + 1), started)
+
+            await asyncio.to_thread(self._finish_sync, full, started, count)
+            print(f"Catalog {'full' if full else 'delta'} sync: {synced} songs in {time.time() - started:.1f}s")
+        except Exception as e:
+            print(f"Catalog sync error: {e}")
+        finally:
+            self.syncing = False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def stream_songs(client: UpstreamClient, params: dict = None, concurrency: int = 4):
+    params = dict(params or {})
+    first = await client.get_json(SONGS_URL, params={**params, "page": 1})
+    if not isinstance(first, dict):
+        return
+
+    results = first.get("results") or []
+    for song in results:
+        yield song
+
+    count = first.get("count")
+    if not isinstance(count, int) or not results or count <= len(results):
+        return
+
+    pages = math.ceil(count / len(results))
+    next_page = 2
+    pending = set()
+
+    # keep a few pages in flight and hand songs over as soon as any page lands
+    try:
+        while next_page <= pages or pending:
+            while next_page <= pages and len(pending) < concurrency:
+                pending.add(asyncio.create_task(client.get_json(SONGS_URL, params={**params, "page": next_page})))
+                next_page += 1
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    data = task.result()
+                except Exception as e:
+                    print(f"Song page fetch error: {e}")
+                    continue
+
+                for song in (data or {}).get("results") or []:
+                    yield song
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,245 @@
+# Runs the bot as several processes, each one an AutoShardedBot for a slice of the shards.
+# Every process has its own event loop, voice threads and ffmpeg children, so voice capacity grows with cores.
+#
+#   python cluster.py                      # one worker per core, shard count from discord
+#   python cluster.py --workers 4 --shards 8
+#
+# The supervisor restarts workers that exit and prints a combined status line from their heartbeats.
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Optional
+
+from config import CLUSTER_DIR
+
+HEARTBEAT_INTERVAL = 15
+# a worker that hasn't written a heartbeat for this long is treated as hung
+HEARTBEAT_TIMEOUT = 120
+# discord allows one identify per 5s per bucket, the supervisor waits this long per shard before starting the next worker
+IDENTIFY_DELAY = 5.5
+MAX_RESTART_BACKOFF = 60
+# a worker that stayed up this long starts over from the shortest backoff
+STABLE_AFTER = 300
+
+
+def heartbeat_path(cluster_id: int) -> str:
+    return os.path.join(CLUSTER_DIR, f"worker-{cluster_id}.json")
+
+
+def write_heartbeat(cluster_id: int, data: dict):
+    os.makedirs(CLUSTER_DIR, exist_ok=True)
+    path = heartbeat_path(cluster_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({**data, "pid": os.getpid(), "time": time.time()}, f)
+    os.replace(tmp, path)
+
+
+def read_heartbeat(cluster_id: int) -> Optional[dict]:
+    try:
+        with open(heartbeat_path(cluster_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def recommended_shards(token: str) -> int:
+    req = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {token}", "User-Agent": "WRLD2 cluster"},
+    )
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return int(json.load(resp)["shards"])
+
+
+def split_shards(shard_count: int, workers: int) -> list:
+    workers = max(1, min(workers, shard_count))
+    return [list(range(shard_count))[i::workers] for i in range(workers)]
+
+
+class Worker:
+    def __init__(self, cluster_id: int, shard_ids: list, shard_count: int):
+        self.cluster_id = cluster_id
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.proc: Optional[subprocess.Popen] = None
+        self.started = 0.0
+        self.restarts = 0
+        self.backoff = 1.0
+        self.next_start = 0.0
+
+    def start(self):
+        try:
+            os.remove(heartbeat_path(self.cluster_id))
+        except OSError:
+            pass
+
+        env = {
+            **os.environ,
+            "CLUSTER_ID": str(self.cluster_id),
+            "SHARD_COUNT": str(self.shard_count),
+            "SHARD_IDS": ",".join(map(str, self.shard_ids)),
+        }
+        main = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+        # own session so a ctrl+c in the terminal only reaches the supervisor, which then stops workers once
+        self.proc = subprocess.Popen([sys.executable, main], env=env, start_new_session=sys.platform != "win32")
+        self.started = time.time()
+        print(f"[cluster] worker {self.cluster_id} started (pid {self.proc.pid}, shards {self.shard_ids})")
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def hung(self) -> bool:
+        if not self.alive() or time.time() - self.started < HEARTBEAT_TIMEOUT:
+            return False
+        beat = read_heartbeat(self.cluster_id)
+        return beat is None or time.time() - beat["time"] > HEARTBEAT_TIMEOUT
+
+    def interrupt(self):
+        if not self.alive():
+            return
+        # SIGINT goes through the bot's normal shutdown, which checkpoints players
+        if sys.platform == "win32":
+            self.proc.terminate()
+        else:
+            self.proc.send_signal(signal.SIGINT)
+
+    def stop(self, timeout: float = 20):
+        if not self.alive():
+            return
+        self.interrupt()
+        self.wait(timeout)
+
+    def wait(self, timeout: float):
+        if not self.alive():
+            return
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+
+    def schedule_restart(self):
+        if time.time() - self.started > STABLE_AFTER:
+            self.backoff = 1.0
+        self.restarts += 1
+        self.next_start = time.time() + self.backoff
+        print(f"[cluster] worker {self.cluster_id} exited ({self.proc.returncode}), restarting in {self.backoff:.0f}s")
+        self.backoff = min(self.backoff * 2, MAX_RESTART_BACKOFF)
+        self.proc = None
+
+
+def summary(workers: list) -> str:
+    totals = {"guilds": 0, "players": 0, "voice": 0, "playing": 0}
+    latencies = []
+    down = []
+    for worker in workers:
+        beat = read_heartbeat(worker.cluster_id) if worker.alive() else None
+        if not beat:
+            down.append(str(worker.cluster_id))
+            continue
+        for key in totals:
+            totals[key] += beat.get(key, 0)
+        if beat.get("latency") is not None:
+            latencies.append(beat["latency"])
+
+    line = (
+        f"[cluster] {len(workers) - len(down)}/{len(workers)} workers up, "
+        f"{totals['guilds']} guilds, {totals['voice']} voice connections, "
+        f"{totals['playing']} playing, {totals['players']} players"
+    )
+    if latencies:
+        line += f", worst latency {max(latencies) * 1000:.0f}ms"
+    if down:
+        line += f", waiting on {', '.join(down)}"
+    return line
+
+
+def supervise(workers: list, status_interval: float):
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # start one at a time so the identifies don't trip discord's rate limit
+    for worker in workers:
+        if stopping:
+            break
+        worker.start()
+        deadline = time.time() + IDENTIFY_DELAY * len(worker.shard_ids)
+        while time.time() < deadline and not stopping and worker.alive():
+            beat = read_heartbeat(worker.cluster_id)
+            if beat and beat.get("ready"):
+                break
+            time.sleep(0.5)
+
+    last_status = 0.0
+    while not stopping:
+        now = time.time()
+        for worker in workers:
+            if worker.proc is None:
+                if now >= worker.next_start:
+                    worker.start()
+            elif worker.hung():
+                print(f"[cluster] worker {worker.cluster_id} stopped sending heartbeats, restarting")
+                worker.stop(timeout=5)
+                worker.schedule_restart()
+            elif not worker.alive():
+                worker.schedule_restart()
+
+        if now - last_status >= status_interval:
+            last_status = now
+            print(summary(workers))
+
+        time.sleep(1)
+
+    print("[cluster] stopping workers")
+    for worker in workers:
+        worker.interrupt()
+    for worker in workers:
+        worker.wait(20)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run WRLD 2 as several sharded worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per core)")
+    parser.add_argument("--shards", type=int, help="total shards (default: SHARD_COUNT, or what discord recommends)")
+    parser.add_argument("--status-interval", type=float, default=60, help="seconds between combined status lines")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    shard_count = args.shards or int(os.getenv("SHARD_COUNT", 0))
+    if not shard_count:
+        token = os.getenv("TOKEN")
+        if not token:
+            print("TOKEN not set in .env")
+            return 1
+        try:
+            shard_count = recommended_shards(token)
+        except Exception as e:
+            print(f"Couldn't get the recommended shard count, pass --shards: {e}")
+            return 1
+
+    groups = split_shards(shard_count, args.workers)
+    print(f"[cluster] {shard_count} shards across {len(groups)} workers")
+
+    workers = [Worker(i, shard_ids, shard_count) for i, shard_ids in enumerate(groups)]
+    supervise(workers, args.status_interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
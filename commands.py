@@ -1,11 +1,51 @@
 import discord
-from discord.ext import commands
+from discord.ext import bridge, commands
 
+import asyncio
 import time
 import platform
 import re
 import stats
-from main import colors
+import metrics
+from radio import is_playable
+from config import colors
+from songindex import confident, MIN_SCORE
+
+MAX_BULK = 500
+# discord shows at most 25 suggestions and gives up on the autocomplete response after 3s
+MAX_CHOICES = 25
+PLAYABLE = ("released", "unreleased")
+
+def prefix(ctx) -> str:
+    return "/" if ctx.is_app else ctx.prefix
+
+async def song_choices(ctx: discord.AutocompleteContext):
+    # only ever the in-memory index, a suggestion that waits on the api would miss discord's deadline
+    with metrics.autocomplete_seconds.time():
+        songs = ctx.bot.song_index.prefix(ctx.value or "", MAX_CHOICES, categories=PLAYABLE)
+    # the link goes through ..play's id lookup instead of a second search
+    return [discord.OptionChoice(name=song["name"][:100], value=f"/songs/{song['id']}/") for song in songs]
+
+class SongPicker(discord.ui.View):
+    def __init__(self, author_id: int, songs: list):
+        super().__init__(timeout=30)
+        self.author_id = author_id
+        self.choice = None
+
+        for i, song in enumerate(songs):
+            button = discord.ui.Button(label=str(i + 1), style=discord.ButtonStyle.gray)
+            button.callback = self._picker(song)
+            self.add_item(button)
+
+    def _picker(self, song):
+        async def callback(interaction: discord.Interaction):
+            if interaction.user.id != self.author_id:
+                return await interaction.response.send_message("Only whoever searched can pick.", ephemeral=True)
+
+            self.choice = song
+            await interaction.response.edit_message(view=None)
+            self.stop()
+        return callback
 
 class MusicCommands(commands.Cog):
     def __init__(self, bot):
@@ -13,14 +53,43 @@ class MusicCommands(commands.Cog):
         self.start_time = time.time()
 
     @property
-    def player(self):
-        return getattr(self.bot, "player", None)
-
-    @commands.command(name="join")
+    def players(self):
+        return getattr(self.bot, "players", None)
+
+    def get_player(self, ctx, start: bool = False):
+        player = self.players.get(ctx.guild.id)
+        # announcements go where playback was started from, not wherever ..q or ..np was last used
+        if start:
+            player.text_channel_id = ctx.channel.id
+        return player
+
+    async def cog_check(self, ctx):
+        return ctx.guild is not None
+
+    async def pick_song(self, ctx, query: str, songs: list):
+        lines = [
+            f"`{i}.` **{song['name']}** - {song['era'] or 'Unknown'} - {(song['category'] or 'Unknown').title()}"
+            for i, song in enumerate(songs, start=1)
+        ]
+        embed = discord.Embed(title=f"Results for \"{query}\"", description="\n".join(lines), color=colors.main)
+        embed.set_footer(text="Pick one within 30 seconds")
+
+        view = SongPicker(ctx.author.id, songs)
+        msg = await ctx.reply(embed=embed, view=view)
+        await view.wait()
+
+        if view.choice is None:
+            await msg.edit(content="No song picked.", embed=None, view=None)
+        return view.choice
+
+    @bridge.bridge_command(name="join", description="Joins your voice channel")
     async def join(self, ctx):
+        player = self.get_player(ctx, start=True)
         if not ctx.author.voice or not ctx.author.voice.channel:
             return await ctx.reply("You need to be in a vc.")
 
+        await ctx.defer()
+
         channel = ctx.author.voice.channel
         vc = ctx.guild.voice_client
 
@@ -30,39 +99,60 @@ class MusicCommands(commands.Cog):
             await vc.move_to(channel)
         else:
             await channel.connect()
-            self.player.on_vc_join()
+            player.on_vc_join()
 
-        await ctx.send(f"Joined <#{channel.id}>")
+        await ctx.respond(f"Joined <#{channel.id}>")
 
-    @commands.command(name="play")
+    @bridge.bridge_command(name="play", description="Plays a song by name or juicewrldapi.com link")
+    @bridge.bridge_option("query", str, description="Song name or link", autocomplete=song_choices, required=False)
     async def play(self, ctx, *, query: str = None):
+        player = self.get_player(ctx, start=True)
         if not query:
-            return await ctx.reply(f"Usage: `{ctx.prefix}play <song or link>`")
+            return await ctx.reply(f"Usage: `{prefix(ctx)}play <song or link>`")
 
+        await ctx.defer()
         if not ctx.guild.voice_client:
             if not ctx.author.voice:
                 return await ctx.reply("You need to be in a vc.")
             await ctx.author.voice.channel.connect()
-            self.player.on_vc_join()
+            player.on_vc_join()
 
-        async with ctx.typing():
-            song_data = None
+        started = time.perf_counter()
+        choices = []
 
+        song_data = None
+
+        with metrics.play_stage_seconds.time(stage="resolve"):
             match = re.search(r"/songs/(\d+)", query)
             if match:
-                song_id = match.group(1)
-                song_data = await self.player.get_song_by_id(song_id)
+                # autocomplete picks arrive as links too, the catalog copy is enough to play them
+                song_data = await player.get_song_by_id(match.group(1), local=True)
             else:
-                song_data = await self.player.search_song(query)
+                # the local index handles typos and alternate titles, the api search is only a fallback
+                results = player.find_songs(query)
+                if confident(results):
+                    song_data = await player.get_song_by_id(results[0][1]["id"], local=True)
+                elif results and results[0][0] >= MIN_SCORE:
+                    choices = [song for _, song in results]
+                else:
+                    song_data = await player.search_song(query)
+
+        if choices:
+            song = await self.pick_song(ctx, query, choices)
+            if not song:
+                return
+            started = time.perf_counter()
+            song_data = await player.get_song_by_id(song["id"], local=True)
 
         if not song_data:
             return await ctx.reply(f"No results found for **{query}**.")
 
-        if song_data.get("category", "").lower() not in ("released", "unreleased"):
+        if song_data.get("category", "").lower() not in PLAYABLE:
             return await ctx.reply("Song must be Released or Unreleased. You can use the JSON url (ex. `https://juicewrldapi.com/juicewrld/songs/25/`)")
 
-        self.player.radio_mode = None
-        self.player.add_to_queue(song_data)
+        with metrics.play_stage_seconds.time(stage="enqueue"):
+            player.radio_mode = None
+            player.add_to_queue(song_data)
 
         embed = discord.Embed(
             title=song_data.get("name", "Unknown"),
@@ -77,10 +167,10 @@ class MusicCommands(commands.Cog):
             inline=True,
         )
 
-        if self.player.is_playing:
+        if player.is_playing:
             embed.add_field(
                 name="Position",
-                value=f"#{len(self.player.queue)}",
+                value=f"#{len(player.queue)}",
                 inline=True,
             )
 
@@ -90,150 +180,215 @@ class MusicCommands(commands.Cog):
 
         await ctx.reply(embed=embed)
 
-        if not self.player.is_playing:
-            await self.player.play_next(ctx)
+        if not player.is_playing:
+            player.requested_at = started
+            await player.play_next(ctx)
+
+    async def _bulk_enqueue(self, ctx, label: str, **filters):
+        player = self.get_player(ctx, start=True)
+        await ctx.defer()
 
-    @commands.command(name="pause")
+        if not ctx.guild.voice_client:
+            if not ctx.author.voice:
+                return await ctx.reply("You need to be in a vc.")
+            await ctx.author.voice.channel.connect()
+            player.on_vc_join()
+
+        started = time.perf_counter()
+        msg = await ctx.reply(f"Queueing songs from **{label}**...")
+
+        added = 0
+        songs = self.bot.catalog.iter_songs(self.bot.upstream, playable=PLAYABLE, limit=MAX_BULK, **filters)
+        try:
+            async for song in songs:
+                if not is_playable(song):
+                    continue
+
+                player.radio_mode = None
+                player.add_to_queue(song)
+                added += 1
+
+                # start on the first match, the rest keeps streaming into the queue behind it.
+                # checked on every add, if a start failed and emptied the queue the next song gets a go
+                if not player.is_playing:
+                    player.requested_at = started
+                    await player.play_next(ctx)
+
+                if added >= MAX_BULK:
+                    break
+        finally:
+            await songs.aclose()
+
+        if not added:
+            return await msg.edit(content=f"No playable songs found for **{label}**.")
+
+        await msg.edit(content=f"Added `{added}` songs from **{label}** ({len(player.queue)} in queue)")
+
+    @bridge.bridge_command(name="playera", aliases=["era"], description="Queues every song from an era")
+    async def play_era(self, ctx, *, era: str = None):
+        if not era:
+            return await ctx.reply(f"Usage: `{prefix(ctx)}playera <era>` (ex. `{prefix(ctx)}playera DRFL`)")
+        await self._bulk_enqueue(ctx, era, era=era)
+
+    @bridge.bridge_command(name="playcat", aliases=["category"], description="Queues a whole category")
+    @bridge.bridge_option("category", str, choices=["released", "unreleased"], required=False)
+    async def play_category(self, ctx, category: str = None):
+        if not category or category.lower() not in PLAYABLE:
+            return await ctx.reply(f"Usage: `{prefix(ctx)}playcat <released|unreleased>`")
+        await self._bulk_enqueue(ctx, category.title(), category=category.lower())
+
+    @bridge.bridge_command(name="playall", description="Queues every search result")
+    async def play_all(self, ctx, *, query: str = None):
+        if not query:
+            return await ctx.reply(f"Usage: `{prefix(ctx)}playall <search>`")
+        await self._bulk_enqueue(ctx, query, search=query)
+
+    @bridge.bridge_command(name="pause", description="Pauses the current song")
     async def pause(self, ctx):
+        player = self.get_player(ctx)
         vc = ctx.guild.voice_client
         if not vc or not vc.is_playing():
             return await ctx.reply("Nothing is playing.")
 
         vc.pause()
-        self.player.is_paused = True
-        await ctx.send("Paused <:juiceL:1407602749851435059>")
+        player.is_paused = True
+        await ctx.respond("Paused <:juiceL:1407602749851435059>")
 
-    @commands.command(name="resume", aliases=['unpause'])
+    @bridge.bridge_command(name="resume", aliases=['unpause'], description="Resumes playback")
     async def resume(self, ctx):
+        player = self.get_player(ctx)
         vc = ctx.guild.voice_client
         if not vc or not vc.is_paused():
             return await ctx.reply("Nothing is paused.")
 
         vc.resume()
-        self.player.is_paused = False
-        await ctx.send("Resumed <:love:1413032472731582505>")
+        player.is_paused = False
+        await ctx.respond("Resumed <:love:1413032472731582505>")
 
-    @commands.command(name="skip", aliases=["s"])
+    @bridge.bridge_command(name="skip", aliases=["s"], description="Skips the current song")
     async def skip(self, ctx):
         vc = ctx.guild.voice_client
         if not vc or not vc.is_playing():
             return await ctx.reply("Nothing is playing.")
 
         vc.stop()
-        await ctx.send("Skipped <:love:1413032472731582505>")
+        await ctx.respond("Skipped <:love:1413032472731582505>")
 
-    @commands.command(name="queue", aliases=["q"])
+    @bridge.bridge_command(name="queue", aliases=["q"], description="Shows the queue")
     async def show_queue(self, ctx):
-        if not self.player.current_song and not self.player.queue:
+        player = self.get_player(ctx)
+        if not player.current_song and not player.queue:
             return await ctx.reply("Queue is empty.")
 
         embed = discord.Embed(title="Current Playlist", color=colors.main)
 
-        if self.player.current_song:
-            song = self.player.current_song
+        if player.current_song:
+            song = player.current_song
+            text = f"**{song.name}**\n{song.era or 'Unknown'}"
 
-            era = song.get("era", {})
-            era_name = era.get("name", "Unknown") if isinstance(era, dict) else "Unknown"
-            text = f"**{song.get('name', 'Unknown')}**\n{era_name}"
-
-            if song.get("length"):
-                text += f" - {song['length']}"
+            if song.length:
+                text += f" - {song.length}"
 
             embed.add_field(name="Now Playing", value=text, inline=False)
 
-        if self.player.queue:
+        if player.queue:
             lines = []
 
-            for i, song in enumerate(list(self.player.queue)[:10], start=1):
-                era = song.get("era", {})
-                era_name = era.get("name", "Unknown") if isinstance(era, dict) else "Unknown"
-
+            for i, song in enumerate(list(player.queue)[:10], start=1):
                 line = (
-                    f"`{i}.` **{song.get('name', 'Unknown')}** - "
-                    f"{era_name} - "
-                    f"{song.get('category', 'Unknown').title()}"
+                    f"`{i}.` **{song.name}** - "
+                    f"{song.era or 'Unknown'} - "
+                    f"{(song.category or 'Unknown').title()}"
                 )
 
-                if song.get("length"):
-                    line += f" • {song['length']}"
+                if song.length:
+                    line += f" • {song.length}"
 
                 lines.append(line)
 
-            if len(self.player.queue) > 10:
-                lines.append(f"*...and {len(self.player.queue) - 10} more*")
+            if len(player.queue) > 10:
+                lines.append(f"*...and {len(player.queue) - 10} more*")
 
             embed.add_field(name="Queue", value="\n".join(lines), inline=False)
 
-        embed.set_footer(text=f"{len(self.player.queue)} songs in queue")
+        embed.set_footer(text=f"{len(player.queue)} songs in queue")
         await ctx.reply(embed=embed)
 
-    @commands.command(name="nowplaying", aliases=["np"])
+    @bridge.bridge_command(name="nowplaying", aliases=["np"], description="Shows the song that's playing")
     async def now_playing(self, ctx):
-        song = self.player.current_song
+        player = self.get_player(ctx)
+        song = player.current_song
         if not song:
             return await ctx.reply("Nothing is playing.")
 
+        info = await player.get_song_by_id(song.id) if song.id is not None else None
+        info = info or {}
+
         embed = discord.Embed(
-            title=song.get("name", "N/A"),
+            title=song.name,
             description=(
-                f"Prod. {song.get('producers', 'Unknown')}\n"
-                f"Eng. {song.get('engineers', 'Unknown')}"
+                f"Prod. {info.get('producers', 'Unknown')}\n"
+                f"Eng. {info.get('engineers', 'Unknown')}"
             ),
             color=colors.main,
         )
 
         details = []
-        if song.get("credited_artists"): details.append(f"Artist(s): {song['credited_artists']}")
-        if song.get("length"): details.append(f"Duration: {song['length']}")
-        if song.get("category"): details.append(f"Type: {song['category'].title()}")
-
-        era = song.get("era")
-        if isinstance(era, dict) and era.get("name"):
-            details.append(f"Era: {era['name']}")
+        if info.get("credited_artists"): details.append(f"Artist(s): {info['credited_artists']}")
+        if song.length: details.append(f"Duration: {song.length}")
+        if song.category: details.append(f"Type: {song.category.title()}")
+        if song.era: details.append(f"Era: {song.era}")
 
         if details:
             embed.add_field(name="Details", value="\n".join(details), inline=False)
 
         embed.set_author(name="Now Playing in VC")
 
-        image_url = song.get("image_url")
+        image_url = info.get("image_url")
         if image_url:
             embed.set_thumbnail(url=f"https://juicewrldapi.com{image_url}")
 
         await ctx.reply(embed=embed)
 
-    @commands.command(name="radio")
+    @bridge.bridge_command(name="radio", description="Plays random songs until stopped")
     async def radio(self, ctx):
+        player = self.get_player(ctx, start=True)
+        await ctx.defer()
         if not ctx.guild.voice_client:
             if not ctx.author.voice:
                 return await ctx.reply("You need to be in a vc.")
             await ctx.author.voice.channel.connect()
-            self.player.on_vc_join()
+            player.on_vc_join()
 
-        self.player.radio_mode = True
+        player.radio_mode = True
 
-        if self.player.is_playing:
+        if player.is_playing:
             msg = "Radio enabled. It will start after the current song."
+            player.prefetch_next()
         else:
             msg = "Radio enabled. Starting now..."
-            await self.player.play_next(ctx)
+            player.requested_at = time.perf_counter()
+            await player.play_next(ctx)
 
-        await ctx.send(msg)
+        await ctx.respond(msg)
 
-    @commands.command(name="stopradio")
+    @bridge.bridge_command(name="stopradio", description="Disables radio")
     async def stop_radio(self, ctx):
-        self.player.radio_mode = None
-        await ctx.send("Radio disabled.")
+        player = self.get_player(ctx)
+        player.radio_mode = None
+        await ctx.respond("Radio disabled.")
 
-    @commands.command(name="about")
+    @bridge.bridge_command(name="about", description="Bot information")
     async def about(self, ctx):
         uptime = self._format_uptime(int(time.time() - self.start_time))
-        db_stats = stats.get_stats()
+        db_stats = await asyncio.to_thread(stats.get_stats)
 
         total_tracks = int(db_stats.get("total_tracks_played", 0))
         total_play_time = int(db_stats.get("total_play_time", 0))
         total_vc_time = int(db_stats.get("total_vc_time", 0))
         radio_songs = int(db_stats.get("radio_songs_played", 0))
+        top_song = await asyncio.to_thread(stats.top_songs, 1)
+        top_name = top_song[0]["song_name"] if top_song else "N/A"
 
         os_name = platform.system()
         if os_name == "Darwin":
@@ -246,6 +401,7 @@ class MusicCommands(commands.Cog):
                         f'`{self._format_uptime(total_play_time)}` spent playing tracks\n'
                         f'`{self._format_uptime(total_vc_time)}` spent in vc\n'
                         f'`{radio_songs}` radio songs played\n'
+                        f'`{top_name}` most played\n'
                         f'`{len(self.bot.commands)}` commands\n'
                         f'`{os_name}` OS'
                         )
@@ -253,7 +409,48 @@ class MusicCommands(commands.Cog):
         embed.set_footer(text='Made with 💖 by @purree')
         await ctx.reply(embed=embed)
 
-    @commands.command(name="ping")
+    @bridge.bridge_command(name="top", aliases=["leaderboard", "lb"], description="Most played songs, all time or this week")
+    @bridge.bridge_option("period", str, choices=["week"], required=False)
+    async def top(self, ctx, period: str = None):
+        weekly = period is not None and period.lower() in ("week", "weekly", "w")
+        songs = await asyncio.to_thread(stats.top_songs, 10, 7 if weekly else None)
+
+        if not songs:
+            return await ctx.reply("Nothing has been played yet.")
+
+        lines = [
+            f"`{i}.` **{song['song_name'] or 'Unknown'}** - {song['era'] or 'Unknown'} • `{song['plays']}` plays"
+            for i, song in enumerate(songs, start=1)
+        ]
+
+        embed = discord.Embed(
+            title="Top Tracks This Week" if weekly else "Top Tracks",
+            description="\n".join(lines),
+            color=colors.main,
+        )
+
+        guild_stats = await asyncio.to_thread(stats.guild_stats, ctx.guild.id)
+        if guild_stats:
+            embed.set_footer(text=f"{guild_stats['plays']} tracks played in this server")
+
+        await ctx.reply(embed=embed)
+
+    @bridge.bridge_command(name="eras", description="Most played eras")
+    async def eras(self, ctx):
+        eras = await asyncio.to_thread(stats.top_eras, 10)
+
+        if not eras:
+            return await ctx.reply("Nothing has been played yet.")
+
+        lines = [
+            f"`{i}.` **{era['era']}** • `{era['plays']}` plays • `{self._format_uptime(int(era['play_time']))}`"
+            for i, era in enumerate(eras, start=1)
+        ]
+
+        embed = discord.Embed(title="Most Played Eras", description="\n".join(lines), color=colors.main)
+        await ctx.reply(embed=embed)
+
+    @bridge.bridge_command(name="ping", description="Bot connection info")
     async def ping(self, ctx):
         api_latency = round(self.bot.latency * 1000)
 
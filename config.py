@@ -0,0 +1,55 @@
+import os
+
+from dotenv import load_dotenv
+
+# settings and constants only, cogs and helper modules import this instead of main so nothing gets set up twice
+load_dotenv()
+
+
+class colors:
+    main = 0x6A0DAD
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.getenv("WRLD_DATA_DIR", BASE_DIR)
+FFMPEG_DIR = os.path.join(BASE_DIR, "ffmpeg")
+
+API_URL = os.getenv("JUICEWRLD_API", "https://juicewrldapi.com/juicewrld").rstrip("/")
+NP_CHANNEL_ID = os.getenv("CHANNEL")
+
+AUDIO_MODE = os.getenv("AUDIO_MODE", "opus").lower()
+MAX_TRACK_FAILURES = 5
+RETRY_BACKOFF = 0.5
+MAX_RETRY_BACKOFF = 8
+
+PLAYER_IDLE_TIMEOUT = int(os.getenv("PLAYER_IDLE_TIMEOUT", 600))
+RADIO_HISTORY = int(os.getenv("RADIO_HISTORY", 50))
+AUDIO_CACHE_MB = int(os.getenv("AUDIO_CACHE_MB", 2048))
+LOUDNESS_TARGET = float(os.getenv("LOUDNESS_TARGET", -14))
+LOUDNESS_WORKERS = int(os.getenv("LOUDNESS_WORKERS", 1))
+
+CATALOG_SYNC_INTERVAL = int(os.getenv("CATALOG_SYNC_INTERVAL", 900))
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", 3600))
+CATALOG_FULL_SYNC = int(os.getenv("CATALOG_FULL_SYNC", 86400))
+
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 10))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", 3))
+SONG_CACHE_MB = int(os.getenv("SONG_CACHE_MB", 32))
+SONG_CACHE_TTL = int(os.getenv("SONG_CACHE_TTL", 3600))
+
+ANNOUNCE_INTERVAL = float(os.getenv("ANNOUNCE_INTERVAL", 1.0))
+CHECKPOINT_INTERVAL = int(os.getenv("CHECKPOINT_INTERVAL", 15))
+RESUME_MAX_AGE = int(os.getenv("RESUME_MAX_AGE", 600))
+# seconds between the audio stutter summary lines, 0 turns them off
+AUDIO_REPORT_INTERVAL = int(os.getenv("AUDIO_REPORT_INTERVAL", 300))
+# seconds the event loop may go without answering before a stack sample is logged, 0 turns the watchdog off
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", 0.25))
+
+# set by cluster.py for each worker, unset means one process with every shard
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", 0)) or None
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()] or None
+CLUSTER_ID = int(os.getenv("CLUSTER_ID")) if os.getenv("CLUSTER_ID") else None
+CLUSTER_DIR = os.path.join(DATA_DIR, "cluster")
+
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
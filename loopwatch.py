@@ -0,0 +1,167 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+import metrics
+
+# how often the watchdog thread checks that the loop still answers
+PROBE_INTERVAL = 0.5
+STALL_THRESHOLD = 0.25
+# about 5 minutes of probes for ..debug
+RECENT = 600
+STACK_DEPTH = 8
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_SKIP = (os.path.dirname(asyncio.__file__), threading.__file__, __file__)
+
+
+def _ours(filename: str) -> bool:
+    return filename.startswith(_HERE) and "site-packages" not in filename
+
+
+def _site(stack: list) -> str:
+    # innermost frame in this project's code, otherwise the innermost frame at all
+    for frame in reversed(stack):
+        if _ours(frame.filename):
+            return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+    return "unknown"
+
+
+class Stall:
+    __slots__ = ("at", "lag", "task", "site", "stack")
+
+    def __init__(self, task: str, stack: list):
+        self.at = time.time()
+        # grows until the loop answers again
+        self.lag = 0.0
+        self.task = task
+        self.stack = stack
+        self.site = _site(stack)
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float = STALL_THRESHOLD, interval: float = PROBE_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[int] = None
+
+        self.lags = deque(maxlen=RECENT)
+        self.max_lag = 0.0
+        self.stalls = deque(maxlen=10)
+        self.stall_count = 0
+        # call site -> count, for loop methods called from a thread that isn't the loop's
+        self.cross_thread: dict[str, int] = {}
+        self.last_cross_thread: Optional[str] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        # called from inside the loop, that's how the loop's thread is known
+        if self._thread or self.threshold <= 0:
+            return
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self._guard()
+        self._thread = threading.Thread(target=self._run, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self):
+        answered = threading.Event()
+        while not self._stop.wait(self.interval):
+            answered.clear()
+            sent = time.perf_counter()
+            try:
+                self.loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return
+
+            stall = None
+            if not answered.wait(self.threshold):
+                stall = self._sample()
+                self.stall_count += 1
+                metrics.loop_stalls_total.inc()
+                print(
+                    f"Event loop blocked for over {self.threshold * 1000:.0f}ms in {stall.task} at {stall.site}:\n"
+                    + "".join(traceback.format_list(stall.stack)).rstrip()
+                )
+                while not answered.wait(1) and not self._stop.is_set():
+                    stall.lag = time.perf_counter() - sent
+
+            lag = time.perf_counter() - sent
+            if stall:
+                stall.lag = lag
+                self.stalls.append(stall)
+            self.lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            metrics.loop_lag_seconds.observe(lag)
+
+    def _sample(self) -> Stall:
+        frame = sys._current_frames().get(self.loop_thread)
+        stack = traceback.extract_stack(frame, limit=STACK_DEPTH * 2) if frame else []
+        stack = [f for f in stack if not f.filename.startswith(_SKIP)][-STACK_DEPTH:]
+        try:
+            task = asyncio.current_task(self.loop)
+        except RuntimeError:
+            task = None
+        name = task.get_name() if task else "a callback"
+        return Stall(name, stack)
+
+    def _guard(self):
+        # asyncio's own check only runs in debug mode, which is too slow to leave on.
+        # wrapping the entry points on this loop catches e.g. a voice thread creating a task or setting a future's result
+        loop = self.loop
+        # create_task goes through call_soon, so it is covered too
+        for name in ("call_soon", "call_at"):
+            method = getattr(loop, name)
+            setattr(loop, name, self._checked(name, method))
+
+    def _checked(self, name: str, method):
+        def checked(*args, **kwargs):
+            if threading.get_ident() != self.loop_thread and not self.loop.is_closed():
+                self._cross_thread(name)
+            return method(*args, **kwargs)
+        return checked
+
+    def _cross_thread(self, name: str):
+        stack = [
+            frame for frame in traceback.extract_stack(sys._getframe(2), limit=STACK_DEPTH * 2)
+            if not frame.filename.startswith(_SKIP)
+        ][-STACK_DEPTH:]
+        site = _site(stack)
+        metrics.loop_cross_thread_calls_total.inc(method=name)
+        self.last_cross_thread = f"{name} from {threading.current_thread().name} at {site}"
+
+        count = self.cross_thread.get(site, 0)
+        self.cross_thread[site] = count + 1
+        # once per call site, the same bug tends to fire on every track
+        if not count:
+            print(
+                f"loop.{name} called from thread {threading.current_thread().name}, use call_soon_threadsafe:\n"
+                + "".join(traceback.format_list(stack)).rstrip()
+            )
+
+    def summary(self) -> dict:
+        lags = sorted(self.lags)
+        return {
+            "p50": lags[len(lags) // 2] if lags else 0.0,
+            "p99": lags[min(len(lags) - 1, len(lags) * 99 // 100)] if lags else 0.0,
+            "max": lags[-1] if lags else 0.0,
+            "stalls": self.stall_count,
+            "cross_thread": sum(self.cross_thread.values()),
+        }
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import metrics
+from audio import get_ffmpeg
+from config import DATA_DIR
+
+DB_PATH = os.path.join(DATA_DIR, "loudness.db")
+
+# never boost more than this, quiet session leaks are mostly noise floor
+MAX_GAIN = 12.0
+# volume isn't a limiter, keep true peak under this after the gain
+PEAK_CEILING = -1.0
+# smaller corrections aren't worth giving up opus passthrough for
+MIN_APPLIED_GAIN = 0.5
+
+_SUMMARY = re.compile(r"I:\s+(-?[\d.]+|-inf) LUFS.*?Peak:\s+(-?[\d.]+|-inf) dBFS", re.S)
+
+
+def _lower_priority(pid: int):
+    # analysis should only get cpu the voice threads don't need. set from outside after spawning,
+    # a preexec_fn isn't safe with the voice and helper threads this process always has
+    if not hasattr(os, "setpriority"):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, pid, 19)
+    except OSError:
+        pass
+
+
+def parse_ebur128(output: str):
+    summary = output.rsplit("Summary:", 1)
+    if len(summary) < 2:
+        return None
+
+    match = _SUMMARY.search(summary[1])
+    if not match or "inf" in match.group(1):
+        return None
+
+    peak = float(match.group(2)) if "inf" not in match.group(2) else -70.0
+    return float(match.group(1)), peak
+
+
+class Loudness:
+    def __init__(self, path: str = DB_PATH, target: float = -14.0, workers: int = 1, max_pending: int = 500):
+        self.target = target
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue: Optional[asyncio.Queue] = None
+        self.queued: set[str] = set()
+        self.tasks: list[asyncio.Task] = []
+        self.analyzed = 0
+        self.failed = 0
+        # paths ffmpeg couldn't measure, not retried until the next start so a bad file isn't analyzed on every play
+        self.unmeasurable: set[str] = set()
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS loudness (
+                path TEXT PRIMARY KEY,
+                integrated REAL NOT NULL,
+                peak REAL NOT NULL,
+                gain REAL NOT NULL,
+                analyzed_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        # path -> gain in dB, small enough to keep whole so a play never waits on sqlite
+        self.gains: dict[str, float] = dict(self._conn.execute("SELECT path, gain FROM loudness").fetchall())
+
+    def __contains__(self, path: str):
+        return path in self.gains
+
+    def gain(self, path: str) -> float:
+        gain = self.gains.get(path, 0.0)
+        return gain if abs(gain) >= MIN_APPLIED_GAIN else 0.0
+
+    def gain_for(self, integrated: float, peak: float) -> float:
+        gain = min(self.target - integrated, PEAK_CEILING - peak, MAX_GAIN)
+        return round(max(gain, -MAX_GAIN), 2)
+
+    def submit(self, path: str, file: str):
+        if self.workers <= 0 or path in self.gains or path in self.queued or path in self.unmeasurable:
+            return
+        if len(self.queued) >= self.max_pending:
+            return
+
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+            self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        self.queued.add(path)
+        self.queue.put_nowait((path, file))
+
+    async def _worker(self):
+        while True:
+            path, file = await self.queue.get()
+            try:
+                result = await self._measure(file)
+                if result is None:
+                    self.unmeasurable.add(path)
+                    self.failed += 1
+                    metrics.loudness_analyses_total.inc(result="failed")
+                    continue
+
+                integrated, peak = result
+                gain = self.gain_for(integrated, peak)
+                await asyncio.to_thread(self._save, path, integrated, peak, gain)
+                self.gains[path] = gain
+                self.analyzed += 1
+                metrics.loudness_analyses_total.inc(result="ok")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.unmeasurable.add(path)
+                self.failed += 1
+                metrics.loudness_analyses_total.inc(result="failed")
+                print(f"Loudness analysis error for {path}: {e}")
+            finally:
+                self.queued.discard(path)
+
+    async def _measure(self, file: str):
+        if not os.path.exists(file):
+            return None
+
+        proc = await asyncio.create_subprocess_exec(
+            await get_ffmpeg() or "ffmpeg",
+            "-nostats", "-hide_banner", "-threads", "1",
+            "-i", file, "-vn",
+            "-af", "ebur128=peak=true:framelog=verbose",
+            "-f", "null", "-",
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        _lower_priority(proc.pid)
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            raise
+
+        if proc.returncode != 0:
+            return None
+        return parse_ebur128(stderr.decode("utf-8", "replace"))
+
+    def _save(self, path: str, integrated: float, peak: float, gain: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO loudness (path, integrated, peak, gain, analyzed_at) VALUES (?, ?, ?, ?, ?)",
+                (path, integrated, peak, gain, time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+        with self._lock:
+            self._conn.close()
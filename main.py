@@ -1,106 +1,180 @@
-import discord
-from discord.ext import commands
-from discord.gateway import DiscordWebSocket
+import startup
+
+with startup.step("import discord"):
+    import discord
+    from discord.ext import bridge, commands, tasks
+    from discord.gateway import DiscordWebSocket
 
 import asyncio
-import aiohttp
 from collections import deque
 from typing import Optional
-from urllib.parse import quote
 import os
-import sys
+import threading
 import time
-from dotenv import load_dotenv
-import random
-import stats
-
-from mobile import WRLD2
-
-load_dotenv()
-stats.init()
-
-class colors:
-    main = 0x6A0DAD
-
-ffmpeg_path = None
-try:
-    from local_ffmpeg import install, is_installed
-
-    ffmpeg_dir = os.path.join(os.path.dirname(__file__), "ffmpeg")
-
-    if not is_installed(path=ffmpeg_dir):
-        print("Installing FFmpeg...")
-        success, message = install(path=ffmpeg_dir)
-        print(message if success else f"FFmpeg install failed: {message}")
-
-    if sys.platform == "win32":
-        ffmpeg_path = os.path.join(ffmpeg_dir, "ffmpeg.exe")
-    else:
-        ffmpeg_path = os.path.join(ffmpeg_dir, "ffmpeg")
-
-    if not os.path.exists(ffmpeg_path):
-        ffmpeg_path = None
-
-except Exception as e:
-    print(f"FFmpeg setup error: {e}")
-    print("Using system FFmpeg")
 
+# one step per module so the startup profile shows which import is slow. a module imported by an earlier one
+# is counted in that earlier step, so shared dependencies (metrics, upstream, i.e. aiohttp) come first
+with startup.step("import config"):
+    import config
+    from config import colors
+with startup.step("import stats"):
+    import stats
+with startup.step("import metrics"):
+    import metrics
+with startup.step("import upstream"):
+    from upstream import UpstreamClient, SONGS_URL, download_url
+with startup.step("import catalog"):
+    from catalog import Catalog
+with startup.step("import radio"):
+    from radio import RadioPool, RadioStation, RADIO_CATEGORIES
+with startup.step("import prefetch"):
+    from prefetch import Prefetcher
+with startup.step("import cache"):
+    from cache import AudioCache, CACHE_DIR
+with startup.step("import audio"):
+    from audio import build_source, find_ffmpeg, get_ffmpeg, StreamStats, TimedSource
+with startup.step("import metacache"):
+    from metacache import MetadataCache, MISSING, normalize_query
+with startup.step("import songs"):
+    from songs import QueueEntry
+with startup.step("import announce"):
+    from announce import Announcer
+with startup.step("import state"):
+    from state import StateStore
+with startup.step("import loudness"):
+    from loudness import Loudness
+with startup.step("import songindex"):
+    from songindex import SongIndex
+with startup.step("import loopwatch"):
+    from loopwatch import LoopWatchdog
+with startup.step("import cluster"):
+    from cluster import HEARTBEAT_INTERVAL, write_heartbeat
+with startup.step("import mobile"):
+    from mobile import WRLD2
+
+upstream = UpstreamClient(timeout=config.UPSTREAM_TIMEOUT, retries=config.UPSTREAM_RETRIES)
+song_cache = MetadataCache(max_bytes=config.SONG_CACHE_MB * 1024 ** 2, ttl=config.SONG_CACHE_TTL)
+song_index = SongIndex()
+
+# anything that touches disk is opened in setup(), importing main has no side effects
+catalog: Optional[Catalog] = None
+state_store: Optional[StateStore] = None
+radio_pool: Optional[RadioPool] = None
+audio_cache: Optional[AudioCache] = None
+loudness: Optional[Loudness] = None
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
 intents.guilds = True
 
-DiscordWebSocket.identify = WRLD2
-bot = commands.Bot(
+bot_options = dict(
     command_prefix=commands.when_mentioned_or('..'),
     intents=intents,
     help_command=None,
-    case_insensitive=True
+    case_insensitive=True,
+    # the slash versions only make sense in a server, same as the prefix ones
+    default_command_contexts={discord.InteractionContextType.guild},
 )
 
-class LyricsButton(discord.ui.View):
-    def __init__(self, lyrics: str):
-        super().__init__(timeout=None)
-        self.lyrics = lyrics
+# cluster.py hands each worker process a slice of the shards
+if config.SHARD_COUNT:
+    bot = bridge.AutoShardedBot(shard_count=config.SHARD_COUNT, shard_ids=config.SHARD_IDS, **bot_options)
+else:
+    bot = bridge.Bot(**bot_options)
+
+LYRICS_ID = "lyrics:"
 
-    @discord.ui.button(label="Lyrics", style=discord.ButtonStyle.gray)
-    async def callback(self, button: discord.ui.Button, interaction: discord.Interaction):
-        lines = self.lyrics.splitlines(keepends=True)
+def lyrics_view(song_id: int) -> discord.ui.View:
+    # not kept in the view store, the button only carries the song id and on_lyrics_click looks the lyrics up
+    view = discord.ui.View(timeout=None, store=False)
+    view.add_item(discord.ui.Button(label="Lyrics", style=discord.ButtonStyle.gray, custom_id=f"{LYRICS_ID}{song_id}"))
+    return view
 
-        chunks = []
-        current = ""
+def chunk_lyrics(lyrics: str, size: int = 4096):
+    chunks = []
+    current = ""
 
-        for line in lines:
-            if len(current) + len(line) > 4096:
+    for line in lyrics.splitlines(keepends=True):
+        if len(current) + len(line) > size:
+            if current:
                 chunks.append(current)
-                current = line
-            else:
-                current += line
+            current = line[:size]
+        else:
+            current += line
 
-        if current:
-            chunks.append(current)
+    if current:
+        chunks.append(current)
 
-        embed = discord.Embed(description=chunks[0], color=colors.main)
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+    return chunks
 
-        for chunk in chunks[1:]:
-            await interaction.followup.send(
-                embed=discord.Embed(description=chunk, color=colors.main),
-                ephemeral=True
-            )
+async def fetch_song(song_id, local: bool = False):
+    key = ("id", str(song_id))
+    cached = song_cache.get(key)
+    if cached is MISSING:
+        return None
+    if cached is not None:
+        return dict(cached)
+
+    song = None
+    # local: the id came from the search index, so the mirror has it even if it's due a sync
+    if catalog.is_fresh() or local:
+        song = await catalog.get(song_id)
+
+    if not song:
+        try:
+            song = await upstream.get_json(f"{SONGS_URL}{song_id}/")
+        except Exception as e:
+            print(f"Get song by ID error: {e}")
+            return None
+
+    song_cache.set(key, song)
+    return dict(song) if song else None
 
 class MusicPlayer:
-    def __init__(self):
+    def __init__(self, guild_id: int, registry: "PlayerRegistry"):
+        self.guild_id = guild_id
+        self.registry = registry
         self.queue = deque()
         self.current_song = None
+        self.current_is_radio = False
         self.is_playing = False
         self.is_paused = False
         self.radio_mode = None
+        self.radio = RadioStation(radio_pool, history=config.RADIO_HISTORY)
+        self.radio_next = None
+        self.prefetcher = Prefetcher(audio_cache)
+        self.track_end_time = None
+        self.requested_at = None
+        self.gaps = deque(maxlen=50)
         self.voice_client: discord.VoiceClient = None
-        self.session: aiohttp.ClientSession = None
+        self.guild: Optional[discord.Guild] = None
+        self.text_channel_id = None
+        self.state = "idle"
+        self.failures = 0
+        self.events: Optional[asyncio.Queue] = None
+        self.scheduler: Optional[asyncio.Task] = None
+        self._resume_handle: Optional[asyncio.TimerHandle] = None
+        self._got_audio = False
+        self._streamed = False
         self.song_start_time = None
+        self.source: Optional[TimedSource] = None
+        # bumped on every start, track_end events carry it so a late callback from a stopped track is ignored
+        self.track_id = 0
+        self.audio_stats = StreamStats()
         self.vc_join_time = None
+        self.last_active = time.time()
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def is_idle(self):
+        # out of voice counts as idle even with a queue or radio left over (kicked, ..leave), nothing would play it
+        guild = bot.get_guild(self.guild_id)
+        vc = guild.voice_client if guild else None
+        if not vc or not vc.is_connected():
+            return True
+        return not (self.is_playing or self.queue or self.radio_mode)
 
     def on_vc_join(self):
         if not self.vc_join_time:
@@ -116,191 +190,585 @@ class MusicPlayer:
         if self.song_start_time:
             elapsed = time.time() - self.song_start_time
             stats.add_time("total_play_time", elapsed)
+
+            song = self.current_song
+            if song:
+                stats.record_play(
+                    song.id,
+                    song.name,
+                    song.era,
+                    self.guild_id,
+                    self.song_start_time,
+                    elapsed,
+                    self.current_is_radio,
+                )
             self.song_start_time = None
 
-    async def get_channel(self):
-        channel_id = os.getenv('CHANNEL')
-        if channel_id:
-            return bot.get_channel(int(channel_id))
-        return None
+    def position(self) -> float:
+        if not self.current_song or not self.source:
+            return 0.0
+        return self.current_song.start + self.source.frames * 0.02
 
-    async def get_session(self):
-        if not self.session or self.session.closed:
-            self.session = aiohttp.ClientSession()
-        return self.session
-    
-    async def get_song_by_id(self, song_id: str):
-        session = await self.get_session()
-        url = f"https://juicewrldapi.com/juicewrld/songs/{song_id}/"
+    def snapshot(self) -> Optional[dict]:
+        # what's needed to pick up where we left off, None when there's nothing worth resuming
+        vc = self.guild.voice_client if self.guild else None
+        if not vc or not vc.is_connected() or not vc.channel:
+            return None
+        if not self.current_song and not self.queue and not self.radio_mode:
+            return None
 
-        try:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    return await resp.json()
-        except Exception as e:
-            print(f"Get song by ID error: {e}")
+        return {
+            "guild_id": self.guild_id,
+            "voice_channel_id": vc.channel.id,
+            "text_channel_id": self.text_channel_id,
+            "radio": bool(self.radio_mode),
+            "current": self.current_song,
+            "position": self.position(),
+            "queue": list(self.queue),
+        }
+
+    async def restore(self, snap: dict):
+        guild = bot.get_guild(self.guild_id)
+        channel = guild.get_channel(snap["voice_channel_id"]) if guild else None
+        if not channel:
+            return False
 
+        vc = guild.voice_client
+        if not vc or not vc.is_connected():
+            try:
+                await channel.connect()
+            except Exception as e:
+                print(f"Resume connect error in {self.guild_id}: {e}")
+                return False
+            self.on_vc_join()
+
+        self.guild = guild
+        self.text_channel_id = snap["text_channel_id"]
+        self.queue.extend(snap["queue"])
+        self.radio_mode = True if snap["radio"] else None
+
+        current = snap["current"]
+        if current:
+            current.start = snap["position"]
+            # a radio track goes back in as the next radio pick, anything queued would turn radio off
+            if current.from_radio and self.radio_mode and not self.queue:
+                self.radio_next = current
+            else:
+                self.queue.appendleft(current)
+
+        await self.post("advance")
+        return True
+
+    async def get_channel(self):
+        # CHANNEL is the main server's np channel, other guilds get the channel the player was started from
+        if config.NP_CHANNEL_ID:
+            channel = bot.get_channel(int(config.NP_CHANNEL_ID))
+            if channel and channel.guild.id == self.guild_id:
+                return channel
+
+        if self.text_channel_id:
+            return bot.get_channel(self.text_channel_id)
         return None
 
+    async def get_song_by_id(self, song_id: str, local: bool = False):
+        return await fetch_song(song_id, local)
+
+    def find_songs(self, query: str, limit: int = 5):
+        return song_index.search(query, limit, categories=RADIO_CATEGORIES)
+
     async def search_song(self, query: str):
-        session = await self.get_session()
-        url = f"https://juicewrldapi.com/juicewrld/songs/?search={quote(query)}"
+        key = ("search", normalize_query(query))
+        cached = song_cache.get(key)
+        if cached is MISSING:
+            return None
+        if cached is not None:
+            return dict(cached)
 
         try:
-            async with session.get(url) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    return data["results"][0] if data.get("results") else None
+            data = await upstream.get_json(SONGS_URL, params={"search": query})
         except Exception as e:
             print(f"Search error: {e}")
-        return None
+            return None
 
-    def add_to_queue(self, song: dict):
+        song = data["results"][0] if data and data.get("results") else None
+        song_cache.set(key, song)
+        if song and "id" in song:
+            song_cache.set(("id", str(song["id"])), song)
+        return dict(song) if song else None
+
+    def add_to_queue(self, song):
+        if isinstance(song, dict):
+            song = QueueEntry.from_song(song)
         self.queue.append(song)
+        if self.is_playing and len(self.queue) == 1:
+            self.prefetch_next()
 
-    async def get_radio_song(self):
-        session = await self.get_session()
-        try:
-            async with session.get("https://juicewrldapi.com/juicewrld/songs/") as resp:
-                if resp.status != 200:
-                    print("Failed to fetch song list")
-                    return None
+    def prefetch_next(self):
+        if self.queue:
+            path = self.queue[0].path
+            if path:
+                self.prefetcher.schedule(path)
+        elif self.radio_mode:
+            asyncio.create_task(self._prefetch_radio())
 
-                data = await resp.json()
-                count = data.get("count")
+    async def _prefetch_radio(self):
+        if not self.radio_next:
+            song = await self.get_radio_song()
+            if song:
+                self.radio_next = QueueEntry.from_song(song, from_radio=True)
 
-                if not isinstance(count, int):
-                    print("Invalid count")
-                    return None
+        if self.radio_next and self.radio_mode and not self.queue:
+            self.prefetcher.schedule(self.radio_next.path)
 
-            for _ in range(15):
-                randomi = random.randint(1, count)
+    async def get_radio_song(self):
+        song = await self.radio.next_song()
+        if not song:
+            print("No valid radio song found")
+        return song
 
-                async with session.get(f"https://juicewrldapi.com/juicewrld/songs/{randomi}/") as song_resp:
-                    if song_resp.status != 200:
-                        continue
+    def post(self, event: str, payload=None):
+        # everything that changes what's playing goes through this guild's scheduler task, one event at a time
+        if self.scheduler is None or self.scheduler.done():
+            self.events = asyncio.Queue()
+            self.scheduler = asyncio.create_task(self._run())
 
-                    song_data = await song_resp.json()
+        done = asyncio.get_running_loop().create_future()
+        self.events.put_nowait((event, payload, done))
+        return done
 
-                    if not isinstance(song_data, dict):
-                        continue
-                    if "path" not in song_data:
-                        continue
+    async def play_next(self, ctx: commands.Context):
+        self.guild = ctx.guild
+        await self.post("advance")
+
+    async def _run(self):
+        while True:
+            event, payload, done = await self.events.get()
+            try:
+                if event == "track_end":
+                    await self._on_track_end(payload)
+                elif event == "advance" and not self.is_playing:
+                    await self._advance()
+            except Exception as e:
+                print(f"Scheduler error in {self.guild_id}: {e}")
+                # otherwise is_playing stays set and every later advance is ignored
+                self.is_playing = False
+                self.current_song = None
+                self.state = "idle"
+            finally:
+                if not done.done():
+                    done.set_result(None)
+
+    async def _on_track_end(self, payload):
+        track_id, error = payload
+        if track_id != self.track_id:
+            return
+        if error:
+            print(f"Playback error: {error}")
 
-                    category = song_data.get("category", "").lower()
-                    if category in ["released", "unreleased"]:
-                        return song_data
+        song = self.current_song
+        self.on_song_end()
+        self.is_playing = False
 
-            print("No valid radio song found")
-            return None
+        # a track that never produced audio is a failed start (dead stream, 5xx, bad file), not a finished song
+        if self._got_audio:
+            self.failures = 0
+            if self._streamed:
+                upstream.breaker.success()
+                # cached once it's done, a download alongside the stream would fetch it twice and slow the start
+                if song and song.path:
+                    audio_cache.fetch(song.path)
+        else:
+            self.failures += 1
+            if self._streamed:
+                upstream.breaker.failure()
+
+        await self._advance()
+
+    async def _advance(self):
+        while True:
+            if self.failures >= config.MAX_TRACK_FAILURES:
+                self.failures = 0
+                self.radio_mode = None
+                self.radio_next = None
+                await self._finish("Too many tracks failed in a row, stopping playback.")
+                return
 
-        except Exception as e:
-            print(f"Song fetch error: {e}")
-            return None
+            if self.failures:
+                await asyncio.sleep(min(config.RETRY_BACKOFF * 2 ** (self.failures - 1), config.MAX_RETRY_BACKOFF))
+
+            if self.queue:
+                self.radio_mode = None
+                song = self.queue.popleft()
+            elif self.radio_mode:
+                if upstream.breaker.is_open() and not self.radio_next:
+                    await self._pause_radio()
+                    return
+
+                song = self.radio_next
+                self.radio_next = None
+                if not song:
+                    radio_song = await self.get_radio_song()
+                    if not radio_song:
+                        self.failures += 1
+                        upstream.breaker.failure()
+                        continue
+                    song = QueueEntry.from_song(radio_song, from_radio=True)
+            else:
+                await self._finish("<:sadjoe:1469924039811399793> Queue finished.")
+                return
 
-    async def play_next(self, ctx: commands.Context):
-        if self.queue:
-            self.radio_mode = None 
-
-        if not self.queue:
-            if self.radio_mode:
-                radio_song = await self.get_radio_song()
-                if radio_song:
-                    radio_song["_from_radio"] = True
-                    self.add_to_queue(radio_song)
-                else:
-                    channel = await self.get_channel()
-                    if channel:
-                        await channel.send("Failed to fetch radio song. Radio stopping.")
-                    self.radio_mode = None
-            
-            if not self.queue:
-                self.is_playing = False
-                self.current_song = None
-                channel = await self.get_channel()
-                if channel:
-                    await channel.send("<:sadjoe:1469924039811399793> Queue finished.")
+            if await self._start(song):
                 return
+            self.failures += 1
 
-        self.current_song = self.queue.popleft()
+    async def _finish(self, message: str):
+        self.is_playing = False
+        self.current_song = None
+        self.track_end_time = None
+        self.state = "idle"
+
+        channel = await self.get_channel()
+        if channel:
+            announcer.notice(channel, message)
+
+    async def _pause_radio(self):
+        self.is_playing = False
+        self.current_song = None
+        self.track_end_time = None
+
+        if self.state != "radio_paused":
+            self.state = "radio_paused"
+            channel = await self.get_channel()
+            if channel:
+                announcer.notice(channel, "JuiceWRLDAPI is having issues, radio is paused and will resume on its own.")
+
+        if self._resume_handle:
+            self._resume_handle.cancel()
+        self._resume_handle = asyncio.get_running_loop().call_later(
+            upstream.breaker.retry_in() + 1, self.post, "advance"
+        )
+
+    async def _start(self, song: QueueEntry) -> bool:
+        # returns False when the track couldn't be started so the scheduler moves on to the next one
+        self.current_song = song
+        self.touch()
         self.is_playing = True
         self.is_paused = False
 
-        is_radio = self.current_song.pop("_from_radio", False)
+        is_radio = song.from_radio
+        self.current_is_radio = is_radio
         stats.increment("total_tracks_played")
         if is_radio:
             stats.increment("radio_songs_played")
 
-        path = self.current_song.get("path")
+        path = song.path
         if not path:
-            print(f"No path for song: {self.current_song.get('name', 'Unknown')}")
-            await self.play_next(ctx)
-            return
+            print(f"No path for song: {song.name}")
+            return False
 
-        vc = ctx.guild.voice_client
+        vc = self.guild.voice_client if self.guild else None
         if not vc or not vc.is_connected():
             self.is_playing = False
             self.current_song = None
-            return
-
-        url = f"https://juicewrldapi.com/juicewrld/files/download/?path={quote(path)}"
+            self.state = "idle"
+            return True
 
-        # shoutout google for this config :sob:
-        ffmpeg_opts = {
-            "before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
-            "options": "-vn",
-        }
+        # play from the cache if we have it, otherwise stream it. the cache is filled when the track ends
+        local_file = self.prefetcher.take(path)
+        if local_file and path not in loudness:
+            loudness.submit(path, local_file)
 
         try:
-            source = discord.FFmpegPCMAudio(
-                url,
-                executable=ffmpeg_path,
-                **ffmpeg_opts
-            )
+            with metrics.play_stage_seconds.time(stage="ffmpeg_spawn"):
+                source = await build_source(
+                    local_file or download_url(path),
+                    path,
+                    vc,
+                    await get_ffmpeg(),
+                    stream=local_file is None,
+                    mode=config.AUDIO_MODE,
+                    start=song.start,
+                    gain=loudness.gain(path),
+                    stats=self.audio_stats,
+                )
         except Exception as e:
-            print(f"FFmpeg error for {self.current_song.get('name', 'Unknown')}: {e}")
-            await self.play_next(ctx)
-            return
+            print(f"FFmpeg error for {song.name}: {e}")
+            return False
 
-        def after_playing(error):
-            if error:
-                print(f"Playback error: {error}")
+        loop = asyncio.get_running_loop()
+        self.track_id += 1
+        track_id = self.track_id
 
-            self.on_song_end()
-            bot.loop.create_task(self.play_next(ctx))
+        def after_playing(error):
+            # runs on the voice thread, hand it back to the loop
+            self.track_end_time = time.perf_counter()
+            loop.call_soon_threadsafe(self.post, "track_end", (track_id, error))
+
+        play_start = time.perf_counter()
+        track_end, self.track_end_time = self.track_end_time, None
+        requested, self.requested_at = self.requested_at, None
+        self._got_audio = False
+        self._streamed = local_file is None
+
+        def on_first_frame():
+            self._got_audio = True
+            now = time.perf_counter()
+            metrics.play_stage_seconds.observe(now - play_start, stage="first_audio")
+            if requested:
+                metrics.time_to_first_audio_seconds.observe(now - requested)
+            if track_end:
+                self.gaps.append(now - track_end)
+                metrics.track_gap_seconds.observe(now - track_end)
 
         self.voice_client = vc
-        vc.play(source, after=after_playing)
+        self.source = TimedSource(source, on_first_frame, self.audio_stats)
+        try:
+            vc.play(self.source, after=after_playing)
+        except Exception as e:
+            # disconnected while the source was built, or something else is still playing
+            print(f"Play error for {song.name}: {e}")
+            self.source.cleanup()
+            self.source = None
+            self.is_playing = False
+            self.current_song = None
+            self.state = "idle"
+            return False
         self.song_start_time = time.time()
+        self.state = "playing"
+
+        self.prefetch_next()
 
         channel = await self.get_channel()
         if channel:
-            message_cont = (
-                f"🎵 Now Playing: **{self.current_song.get('name', 'Unknown')}** "
-                f"(Prod. {self.current_song.get('producers', 'Unknown')}) - "
-                f"{self.current_song.get('category', 'Unknown').title()}"
-                f"\nDuration: {self.current_song.get('length', 'Unknown')}"
-            )
-            
-            view = None
-            if self.current_song.get('lyrics'):
-                view = LyricsButton(self.current_song['lyrics'])
-            
-            await channel.send(message_cont, view=view)
+            announcer.now_playing(channel, lambda: self.now_playing_message(song))
+
+        return True
+
+    async def now_playing_message(self, song: QueueEntry) -> dict:
+        # producers and lyrics aren't kept in the queue, this is normally a cache hit
+        details = await self.get_song_by_id(song.id) if song.id is not None else None
+        details = details or {}
+
+        content = (
+            f"🎵 Now Playing: **{song.name}** "
+            f"(Prod. {details.get('producers', 'Unknown')}) - "
+            f"{(song.category or 'Unknown').title()}"
+            f"\nDuration: {song.length or 'Unknown'}"
+        )
+
+        view = lyrics_view(song.id) if details.get('lyrics') else None
+        return {"content": content, "view": view}
+
+    def clear(self):
+        self.on_song_end()
+        self.prefetcher.cancel()
+        self.radio_mode = None
+        self.radio_next = None
+        self.queue.clear()
+        self.current_song = None
+        self.is_playing = False
+        self.is_paused = False
+        self.state = "idle"
+        if self._resume_handle:
+            self._resume_handle.cancel()
+            self._resume_handle = None
 
     async def cleanup(self):
         self.on_song_end()
         self.on_vc_leave()
-        if self.session and not self.session.closed:
-            await self.session.close()
+        self.prefetcher.cancel()
+        if self._resume_handle:
+            self._resume_handle.cancel()
+        if self.scheduler and not self.scheduler.done():
+            self.scheduler.cancel()
+        await asyncio.to_thread(stats.flush)
+
+class PlayerRegistry:
+    def __init__(self, idle_timeout: int = 600):
+        self.players: dict[int, MusicPlayer] = {}
+        self.idle_timeout = idle_timeout
+
+    def __len__(self):
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(list(self.players.values()))
+
+    def get(self, guild_id: int) -> MusicPlayer:
+        player = self.players.get(guild_id)
+        if player is None:
+            player = MusicPlayer(guild_id, self)
+            self.players[guild_id] = player
+
+        player.touch()
+        return player
+
+    def peek(self, guild_id: int) -> Optional[MusicPlayer]:
+        return self.players.get(guild_id)
+
+    async def evict_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        for guild_id, player in list(self.players.items()):
+            if player.last_active < cutoff and player.is_idle():
+                player.clear()
+                await player.cleanup()
+                del self.players[guild_id]
+
+    async def checkpoint(self):
+        snapshots = [snap for snap in (player.snapshot() for player in self) if snap]
+        try:
+            await asyncio.to_thread(state_store.save, snapshots)
+        except Exception as e:
+            print(f"Checkpoint error: {e}")
+
+    async def restore(self, max_age: float):
+        snapshots = await asyncio.to_thread(state_store.load, max_age)
+        if not snapshots:
+            return
+
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.get(snap["guild_id"]).restore(snap) for snap in snapshots),
+            return_exceptions=True,
+        )
+        resumed = sum(1 for result in results if result is True)
+        print(f"Resumed {resumed}/{len(snapshots)} players in {time.perf_counter() - started:.1f}s")
+
+    async def cleanup(self):
+        for player in self:
+            await player.cleanup()
+        self.players.clear()
+        await asyncio.to_thread(stats.flush)
+
+players = PlayerRegistry(idle_timeout=config.PLAYER_IDLE_TIMEOUT)
+bot.players = players
+bot.song_cache = song_cache
+bot.upstream = upstream
+bot.song_index = song_index
+announcer = Announcer(min_interval=config.ANNOUNCE_INTERVAL)
+bot.announcer = announcer
+watchdog = LoopWatchdog(threshold=config.LOOP_STALL_THRESHOLD)
+bot.watchdog = watchdog
+
+def setup():
+    global catalog, state_store, radio_pool, audio_cache, loudness
+
+    with startup.step("stats"):
+        stats.init()
+    with startup.step("catalog"):
+        catalog = Catalog(max_age=config.CATALOG_MAX_AGE, full_sync_interval=config.CATALOG_FULL_SYNC)
+    with startup.step("saved state"):
+        state_store = StateStore(shard_ids=config.SHARD_IDS, shard_count=config.SHARD_COUNT)
+    with startup.step("audio cache scan"):
+        # each cluster worker gets its own directory, evicting from a shared one would delete files other workers still list
+        cache_dir = os.path.join(CACHE_DIR, str(config.CLUSTER_ID)) if config.CLUSTER_ID is not None else CACHE_DIR
+        audio_cache = AudioCache(upstream, directory=cache_dir, max_bytes=config.AUDIO_CACHE_MB * 1024 ** 2)
+    with startup.step("loudness table"):
+        loudness = Loudness(target=config.LOUDNESS_TARGET, workers=config.LOUDNESS_WORKERS)
+
+    # every track that lands in the cache gets measured once in the background
+    audio_cache.on_cached = loudness.submit
+
+    radio_pool = RadioPool(catalog, upstream)
+    bot.catalog = catalog
+    bot.loudness = loudness
+    DiscordWebSocket.identify = WRLD2
+
+    # may have to download ffmpeg, that shouldn't hold up logging in
+    threading.Thread(target=find_ffmpeg, name="ffmpeg-discovery", daemon=True).start()
+
+def register_gauges():
+    metrics.Gauge(
+        "wrld_queue_depth",
+        "Tracks waiting in each guild's queue",
+        lambda: {(("guild", p.guild_id),): len(p.queue) for p in players},
+    )
+    metrics.Gauge("wrld_players", "Guild players held in memory", lambda: len(players))
+    metrics.Gauge("wrld_voice_connections", "Connected voice clients", lambda: sum(1 for vc in bot.voice_clients if vc.is_connected()))
+    metrics.Gauge(
+        "wrld_ffmpeg_processes",
+        "ffmpeg processes feeding voice clients",
+        lambda: sum(1 for vc in bot.voice_clients if vc.is_playing() or vc.is_paused()),
+    )
+    metrics.Gauge("wrld_announce_pending", "Announcements waiting to be sent", announcer.pending)
+    metrics.Gauge("wrld_loudness_pending", "Tracks waiting for loudness analysis", lambda: len(loudness.queued))
+
+@tasks.loop(minutes=1)
+async def evict_idle_players():
+    await players.evict_idle()
+
+@tasks.loop(seconds=config.CHECKPOINT_INTERVAL)
+async def checkpoint_players():
+    await players.checkpoint()
+
+async def refresh_index():
+    try:
+        await song_index.refresh(catalog)
+    except Exception as e:
+        print(f"Search index error: {e}")
+
+@tasks.loop(seconds=config.CATALOG_SYNC_INTERVAL)
+async def sync_catalog():
+    # searchable from the mirror straight away, even if the sync below takes a while
+    if not song_index:
+        await refresh_index()
+        if song_index:
+            print(f"Search index: {len(song_index)} songs in {song_index.build_seconds * 1000:.0f} ms")
+
+    # in a cluster only the first worker talks to the api, the rest read the mirror it keeps
+    if config.CLUSTER_ID:
+        await asyncio.to_thread(catalog.reload)
+    else:
+        await catalog.sync(upstream)
+    radio_pool.schedule_refill()
+    await refresh_index()
+
+def audio_report() -> Optional[str]:
+    # one line for every stream that played since the last report, with the worst guild called out
+    active = []
+    for player in players:
+        counts = player.audio_stats.counts_since_report()
+        if any(counts):
+            active.append((player.guild_id, player.audio_stats.summary(), counts))
+    if not active:
+        return None
+
+    underruns, late, reconnects = (sum(counts[i] for _, _, counts in active) for i in (1, 2, 3))
+    worst_guild, worst, _ = max(active, key=lambda a: a[1]["read_p99"])
+    return (
+        f"Audio: {len(active)} streams, {underruns} underruns, {late} late frames, {reconnects} ffmpeg reconnects. "
+        f"Worst read p99 {worst['read_p99'] * 1000:.1f}ms, jitter p99 {worst['jitter_p99'] * 1000:.1f}ms in guild {worst_guild}"
+    )
 
-player = MusicPlayer()
-bot.player = player
+@tasks.loop(seconds=max(config.AUDIO_REPORT_INTERVAL, 1))
+async def report_audio():
+    line = audio_report()
+    if line:
+        print(line)
+
+@tasks.loop(seconds=HEARTBEAT_INTERVAL)
+async def heartbeat():
+    data = {
+        "ready": bot.is_ready(),
+        "shards": config.SHARD_IDS,
+        "guilds": len(bot.guilds),
+        "players": len(players),
+        "voice": sum(1 for vc in bot.voice_clients if vc.is_connected()),
+        "playing": sum(1 for vc in bot.voice_clients if vc.is_playing()),
+        "latency": bot.latency if bot.is_ready() else None,
+    }
+    try:
+        await asyncio.to_thread(write_heartbeat, config.CLUSTER_ID, data)
+    except OSError as e:
+        print(f"Heartbeat error: {e}")
 
-@bot.command(name="help")
+@bot.bridge_command(name="help", description="Lists the commands")
 async def help(ctx):
     hlist = (
         "play <song> - plays the specified song, accepts name OR direct url (ex. https://juicewrldapi.com/juicewrld/songs/25/)\n"
+        "playera <era> - queues every song from an era\n"
+        "playcat <released|unreleased> - queues a whole category\n"
+        "playall <search> - queues every search result\n"
         "join - joins your voice channel\n"
         "pause - pauses the current song\n"
         "resume - resumes playback\n"
@@ -309,26 +777,74 @@ async def help(ctx):
         "nowplaying / np - shows the current song playing\n"
         "radio - enables randomly playing songs\n"
         "stopradio - disables radio\n"
+        "top [week] - most played songs, all time or this week\n"
+        "eras - most played eras\n"
         "ping - bot connection info\n"
         "about - bot information"
     )
 
-    await ctx.reply(f"Prefix: `{ctx.prefix}` ```{hlist}```")
+    prefix = "/" if ctx.is_app else ctx.prefix
+    await ctx.respond(f"Prefix: `{prefix}` (all of these also work as slash commands) ```{hlist}```")
 
 @bot.event
 async def on_voice_state_update(member, before, after):
     if member.id == bot.user.id and before.channel and not after.channel:
-        player.on_vc_leave()
+        player = players.peek(member.guild.id)
+        if player:
+            player.on_vc_leave()
+
+@bot.listen("on_interaction")
+async def on_lyrics_click(interaction: discord.Interaction):
+    if interaction.type != discord.InteractionType.component:
+        return
+
+    custom_id = (interaction.data or {}).get("custom_id", "")
+    if not custom_id.startswith(LYRICS_ID):
+        return
+
+    # a lookup that falls through to the api can take longer than discord's 3s to answer the click
+    await interaction.response.defer(ephemeral=True, invisible=False)
+
+    song = await fetch_song(custom_id[len(LYRICS_ID):])
+    lyrics = (song or {}).get("lyrics")
+    if not lyrics:
+        return await interaction.followup.send("No lyrics found for this song.", ephemeral=True)
+
+    for chunk in chunk_lyrics(lyrics):
+        await interaction.followup.send(
+            embed=discord.Embed(description=chunk, color=colors.main),
+            ephemeral=True
+        )
 
 @bot.event
 async def on_ready():
     print("Bot is ready 🎶\nMade by pure, powered by juicewrldapi")
     print(f"Logged in as {bot.user}")
+    startup.report()
+
+    if config.CLUSTER_ID is not None:
+        # let the supervisor know right away instead of on the next beat
+        await heartbeat()
+
+    if not evict_idle_players.is_running():
+        evict_idle_players.start()
+    if not sync_catalog.is_running():
+        sync_catalog.start()
+    if config.AUDIO_REPORT_INTERVAL and not report_audio.is_running():
+        report_audio.start()
+
+    # restore before the first checkpoint, otherwise it would overwrite the saved state with nothing
+    if not checkpoint_players.is_running():
+        await players.restore(max_age=config.RESUME_MAX_AGE)
+        checkpoint_players.start()
 
 async def main():
+    setup()
+
     for ext in ['commands', 'admin']:
         try:
-            bot.load_extension(ext)
+            with startup.step(f"load {ext}"):
+                bot.load_extension(ext)
             print(f"Loaded file: {ext}")
         except Exception as e:
             print(f"Failed to load file {ext}: {e}")
@@ -338,11 +854,33 @@ async def main():
         print("TOKEN not set in .env")
         return
 
+    if config.METRICS_PORT:
+        register_gauges()
+        # cluster workers get consecutive ports starting at METRICS_PORT
+        await metrics.start_server(config.METRICS_HOST, int(config.METRICS_PORT) + (config.CLUSTER_ID or 0))
+
+    if config.CLUSTER_ID is not None:
+        heartbeat.start()
+
+    # started after setup, which blocks on purpose
+    watchdog.start(asyncio.get_running_loop())
+
     async with bot:
         try:
             await bot.start(token)
         finally:
-            await player.cleanup()
+            audio_cache.cancel_downloads()
+            announcer.close()
+            if checkpoint_players.is_running():
+                checkpoint_players.cancel()
+                await players.checkpoint()
+            await players.cleanup()
+            await upstream.close()
+            catalog.close()
+            state_store.close()
+            loudness.close()
+            stats.shutdown()
+            watchdog.stop()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,84 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# stored for lookups that came back empty, so repeated misses don't hit the api either
+MISSING = object()
+
+
+def _sizeof(value, depth: int = 0) -> int:
+    # rough size, good enough to keep a couple of huge lyric payloads from pushing everything else out
+    size = sys.getsizeof(value)
+    if depth > 4:
+        return size
+    if isinstance(value, dict):
+        size += sum(_sizeof(k, depth + 1) + _sizeof(v, depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(v, depth + 1) for v in value)
+    return size
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class MetadataCache:
+    def __init__(self, max_bytes: int = 32 * 1024 ** 2, ttl: float = 3600, negative_ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        # key -> (expires, size, value)
+        self._entries: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires, size, value = entry
+        if expires < time.monotonic():
+            self._pop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value: Optional[dict]):
+        if value is None:
+            value, ttl = MISSING, self.negative_ttl
+        else:
+            ttl = self.ttl
+
+        size = _sizeof(value) if value is not MISSING else 64
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._pop(key)
+
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self.size += size
+
+        while self.size > self.max_bytes and self._entries:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _pop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
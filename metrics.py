@@ -0,0 +1,194 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry = []
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        # metrics get touched from the voice player threads too
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self):
+        return []
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Optional[Callable] = None):
+        super().__init__(name, help)
+        self._values = {}
+        # callback returns a number, or a dict of {labels dict as tuple: value}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_labels(labels)] = value
+
+    def samples(self):
+        if self.callback:
+            try:
+                result = self.callback()
+            except Exception as e:
+                print(f"Metric {self.name} callback error: {e}")
+                return []
+
+            if isinstance(result, dict):
+                return [(self.name, _labels(dict(key)), value) for key, value in result.items()]
+            return [(self.name, (), result)]
+
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., sum, count]
+        self._values = {}
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, data in self._values.items():
+                for bound, count in zip(self.buckets, data):
+                    out.append((f"{self.name}_bucket", key + (("le", str(bound)),), count))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), data[-1]))
+                out.append((f"{self.name}_sum", key, data[-2]))
+                out.append((f"{self.name}_count", key, data[-1]))
+        return out
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+async def _handle(request):
+    return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 9100):
+    app = web.Application()
+    app.router.add_get("/metrics", _handle)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Metrics available on http://{host}:{port}/metrics")
+    return runner
+
+
+play_stage_seconds = Histogram("wrld_play_stage_seconds", "Time spent in each stage of ..play")
+time_to_first_audio_seconds = Histogram(
+    "wrld_time_to_first_audio_seconds", "Time from a command starting playback to the first audio frame"
+)
+track_gap_seconds = Histogram("wrld_track_gap_seconds", "Silence between one track ending and the next starting")
+autocomplete_seconds = Histogram(
+    "wrld_autocomplete_seconds", "Time to build /play autocomplete suggestions",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+loop_lag_seconds = Histogram(
+    "wrld_loop_lag_seconds", "Delay before the event loop runs a callback scheduled from the watchdog thread",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+loop_stalls_total = Counter("wrld_loop_stalls_total", "Times the event loop was blocked past the stall threshold")
+loop_cross_thread_calls_total = Counter(
+    "wrld_loop_cross_thread_calls_total", "Non-thread-safe event loop methods called from another thread"
+)
+audio_read_seconds = Histogram(
+    "wrld_audio_read_seconds", "Time the voice thread waited on ffmpeg for each 20ms frame",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5),
+)
+audio_send_jitter_seconds = Histogram(
+    "wrld_audio_send_jitter_seconds", "How far each frame was sent from 20ms after the previous one",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.02, 0.05, 0.1, 0.5),
+)
+audio_underruns_total = Counter("wrld_audio_underruns_total", "Frames ffmpeg took longer than 20ms to deliver")
+audio_late_frames_total = Counter("wrld_audio_late_frames_total", "Frames sent more than a frame behind the 20ms cadence")
+ffmpeg_reconnects_total = Counter("wrld_ffmpeg_reconnects_total", "Times ffmpeg reopened a dropped http stream")
+upstream_request_seconds = Histogram("wrld_upstream_request_seconds", "JuiceWRLDAPI request latency")
+upstream_responses_total = Counter("wrld_upstream_responses_total", "JuiceWRLDAPI responses by status")
+announcements_total = Counter("wrld_announcements_total", "Now playing and status messages by outcome")
+loudness_analyses_total = Counter("wrld_loudness_analyses_total", "Background loudness measurements by result")
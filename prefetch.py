@@ -0,0 +1,26 @@
+from typing import Optional
+
+from cache import AudioCache
+
+
+class Prefetcher:
+    def __init__(self, cache: AudioCache):
+        self.cache = cache
+        self.path: Optional[str] = None
+
+    @property
+    def ready(self):
+        return self.path is not None and self.path in self.cache
+
+    def schedule(self, path: str):
+        # downloads land in the shared cache, so they are left running even if the queue changes
+        self.path = path
+        self.cache.fetch(path)
+
+    def take(self, path: str) -> Optional[str]:
+        if self.path == path:
+            self.path = None
+        return self.cache.get(path)
+
+    def cancel(self):
+        self.path = None
@@ -0,0 +1,154 @@
+import asyncio
+import random
+from collections import Counter, deque
+from typing import Optional
+
+from upstream import UpstreamClient, SONGS_URL
+
+RADIO_CATEGORIES = ("released", "unreleased")
+
+
+def is_playable(song) -> bool:
+    if not isinstance(song, dict) or not song.get("path"):
+        return False
+    return (song.get("category") or "").lower() in RADIO_CATEGORIES
+
+
+class RadioPool:
+    def __init__(self, catalog, client: UpstreamClient, min_size: int = 25, probe_batch: int = 40, probe_concurrency: int = 5):
+        self.catalog = catalog
+        self.client = client
+        self.min_size = min_size
+        self.probe_batch = probe_batch
+        self.probe_concurrency = probe_concurrency
+
+        self.ids: list[int] = []
+        self._known: set[int] = set()
+        # songs found by live probing while the catalog is cold, keyed by id
+        self.songs: dict[int, dict] = {}
+        self._refill_task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _set_ids(self, ids):
+        self.ids = list(ids)
+        self._known = set(self.ids)
+
+    def _add(self, song: dict):
+        song_id = int(song["id"])
+        self.songs[song_id] = song
+        if song_id not in self._known:
+            self._known.add(song_id)
+            self.ids.append(song_id)
+
+    def discard(self, song_id: int):
+        if song_id in self._known:
+            self._known.discard(song_id)
+            self.ids.remove(song_id)
+        self.songs.pop(song_id, None)
+
+    async def refill(self):
+        try:
+            if self.catalog.warm:
+                self._set_ids(await self.catalog.playable_ids(RADIO_CATEGORIES))
+                self.songs.clear()
+            else:
+                await self._probe()
+        except Exception as e:
+            print(f"Radio pool refill error: {e}")
+
+    def schedule_refill(self):
+        if self._refill_task and not self._refill_task.done():
+            return self._refill_task
+        self._refill_task = asyncio.create_task(self.refill())
+        return self._refill_task
+
+    async def _probe(self):
+        data = await self.client.get_json(SONGS_URL)
+        count = data.get("count") if data else None
+
+        if not isinstance(count, int) or count < 1:
+            print("Radio pool: failed to fetch song count")
+            return
+
+        sem = asyncio.Semaphore(self.probe_concurrency)
+        candidates = random.sample(range(1, count + 1), min(self.probe_batch, count))
+
+        async def probe(song_id):
+            async with sem:
+                try:
+                    song = await self.client.get_json(f"{SONGS_URL}{song_id}/")
+                except Exception:
+                    return
+
+            if is_playable(song) and "id" in song:
+                self._add(song)
+
+        await asyncio.gather(*(probe(i) for i in candidates))
+
+    async def resolve(self, song_id: int) -> Optional[dict]:
+        song = self.songs.get(song_id)
+        if song is None and self.catalog.warm:
+            song = await self.catalog.get(song_id)
+        return song if is_playable(song) else None
+
+
+class RadioStation:
+    def __init__(self, pool: RadioPool, history: int = 50):
+        self.pool = pool
+        self.deck: list[int] = []
+        self.history = deque(maxlen=max(history, 0))
+        self._recent = Counter()
+
+    def _remember(self, song_id: int):
+        if self.history.maxlen == 0:
+            return
+
+        if len(self.history) == self.history.maxlen:
+            oldest = self.history[0]
+            self._recent[oldest] -= 1
+            if not self._recent[oldest]:
+                del self._recent[oldest]
+
+        self.history.append(song_id)
+        self._recent[song_id] += 1
+
+    def next_id(self) -> Optional[int]:
+        pool = self.pool.ids
+        if not pool:
+            return None
+
+        for _ in range(len(pool) + 1):
+            if not self.deck:
+                self.deck = pool.copy()
+                random.shuffle(self.deck)
+
+            song_id = self.deck.pop()
+            # once the history covers the whole pool anything is allowed again
+            if song_id in self._recent and len(self._recent) < len(pool):
+                continue
+
+            self._remember(song_id)
+            return song_id
+
+        return None
+
+    async def next_song(self) -> Optional[dict]:
+        if len(self.pool) < self.pool.min_size:
+            task = self.pool.schedule_refill()
+            if not self.pool.ids:
+                await task
+
+        for _ in range(5):
+            song_id = self.next_id()
+            if song_id is None:
+                return None
+
+            song = await self.pool.resolve(song_id)
+            if song:
+                return dict(song)
+
+            self.pool.discard(song_id)
+
+        return None
@@ -0,0 +1,201 @@
+import asyncio
+import bisect
+import heapq
+import json
+import re
+import time
+from collections import Counter
+
+# how many songs sharing the most trigrams with the query get fully scored
+CANDIDATES = 50
+COMMON_GRAM = 200
+# a one letter prefix can match most of the catalog, ranking stops looking after this many titles
+PREFIX_SCAN = 5000
+# below this nothing in the index is close enough, the api search gets a go instead
+MIN_SCORE = 0.3
+# a match this good and this far ahead of the next one is played without asking
+CONFIDENT_SCORE = 0.6
+CONFIDENT_MARGIN = 0.15
+
+_STRIP = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    text = _STRIP.sub(" ", (text or "").lower().replace("'", "").replace("’", ""))
+    return _SPACES.sub(" ", text).strip()
+
+
+def trigrams(text: str) -> frozenset:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def score(query: str, query_grams: frozenset, title: str, title_grams: frozenset) -> float:
+    # dice overlap handles typos, the bonuses put exact and prefix matches ahead of merely similar titles
+    shared = len(query_grams & title_grams)
+    value = 2 * shared / (len(query_grams) + len(title_grams))
+    if title == query:
+        value += 1.0
+    elif title.startswith(query):
+        value += 0.5
+    elif query in title:
+        value += 0.25
+    return value
+
+
+def confident(results: list) -> bool:
+    if not results:
+        return False
+    best = results[0][0]
+    runner_up = results[1][0] if len(results) > 1 else 0.0
+    if best >= 1.0 and runner_up < 1.0:
+        return True
+    return best >= CONFIDENT_SCORE and best - runner_up >= CONFIDENT_MARGIN
+
+
+def _titles(row) -> list:
+    titles = [row["name"]]
+    try:
+        extra = json.loads(row["track_titles"]) if row["track_titles"] else []
+    except (TypeError, ValueError):
+        extra = []
+    if isinstance(extra, list):
+        titles.extend(t for t in extra if isinstance(t, str))
+
+    seen = []
+    for title in map(normalize, titles):
+        if title and title not in seen:
+            seen.append(title)
+    return seen
+
+
+class SongIndex:
+    def __init__(self):
+        # song id -> {"id", "name", "category", "era", "path"}
+        self.songs: dict[int, dict] = {}
+        # song id -> [(normalized title, trigrams)], the name first then the track's other titles
+        self.titles: dict[int, list] = {}
+        self.grams: dict[str, set] = {}
+        # (normalized title, song id), sorted, for autocomplete
+        self.prefixes: list = []
+        self.synced_at = 0.0
+        self.built_at = 0.0
+        self.build_seconds = 0.0
+
+    def __len__(self):
+        return len(self.songs)
+
+    def _add(self, row, sort: bool = True):
+        song_id = row["id"]
+        if song_id in self.songs:
+            self._remove(song_id)
+
+        titles = [(title, trigrams(title)) for title in _titles(row)]
+        self.songs[song_id] = {
+            "id": song_id,
+            "name": row["name"],
+            "category": row["category"],
+            "era": row["era"],
+            "path": row["path"],
+        }
+        self.titles[song_id] = titles
+        for title, grams in titles:
+            for gram in grams:
+                self.grams.setdefault(gram, set()).add(song_id)
+            if sort:
+                bisect.insort(self.prefixes, (title, song_id))
+            else:
+                self.prefixes.append((title, song_id))
+
+    def _remove(self, song_id: int):
+        self.songs.pop(song_id, None)
+        for title, grams in self.titles.pop(song_id, []):
+            i = bisect.bisect_left(self.prefixes, (title, song_id))
+            if i < len(self.prefixes) and self.prefixes[i] == (title, song_id):
+                del self.prefixes[i]
+            for gram in grams:
+                ids = self.grams.get(gram)
+                if ids:
+                    ids.discard(song_id)
+                    if not ids:
+                        del self.grams[gram]
+
+    def search(self, query: str, limit: int = 5, categories=None) -> list:
+        # [(score, song)], best first
+        query = normalize(query)
+        if not query or not self.songs:
+            return []
+
+        query_grams = trigrams(query)
+        postings = [ids for ids in map(self.grams.get, query_grams) if ids]
+        # grams most titles share ("  s", "ng ") say little and cost the most to count, skip them when rarer ones exist
+        common = max(COMMON_GRAM, len(self.songs) // 10)
+        rare = [ids for ids in postings if len(ids) <= common]
+
+        counts = Counter()
+        for ids in rare or postings:
+            counts.update(ids)
+
+        results = []
+        for song_id, _ in counts.most_common(CANDIDATES if not categories else CANDIDATES * 4):
+            song = self.songs[song_id]
+            if categories and song["category"] not in categories:
+                continue
+            best = max(score(query, query_grams, title, grams) for title, grams in self.titles[song_id])
+            results.append((best, song))
+
+        results.sort(key=lambda r: (-r[0], r[1]["id"]))
+        return results[:limit]
+
+    def prefix(self, text: str, limit: int = 25, categories=None) -> list:
+        # cheap enough for autocomplete, falls back to fuzzy search once nothing starts with the text
+        text = normalize(text)
+        if not text:
+            return []
+
+        # song id -> shortest matching title, the exact title is the shortest there can be
+        best = {}
+        i = bisect.bisect_left(self.prefixes, (text,))
+        for title, song_id in self.prefixes[i:i + PREFIX_SCAN]:
+            if not title.startswith(text):
+                break
+            if categories and self.songs[song_id]["category"] not in categories:
+                continue
+            if song_id not in best or len(title) < len(best[song_id]):
+                best[song_id] = title
+
+        if not best:
+            return [song for _, song in self.search(text, limit, categories)]
+        ranked = heapq.nsmallest(limit, best.items(), key=lambda item: (len(item[1]), item[1], item[0]))
+        return [self.songs[song_id] for song_id, _ in ranked]
+
+    async def refresh(self, catalog):
+        if not catalog.warm:
+            return
+
+        started = time.perf_counter()
+        # a full sync may have dropped songs, so start over; otherwise only what changed since last time
+        if not self.songs or catalog.last_full_sync > self.built_at:
+            index = SongIndex()
+            rows = await catalog.titles()
+            await asyncio.to_thread(index._build, rows)
+            self.songs, self.titles, self.grams, self.prefixes = index.songs, index.titles, index.grams, index.prefixes
+            self.synced_at = index.synced_at
+            self.built_at = time.time()
+        else:
+            rows = await catalog.titles(since=self.synced_at)
+            if not rows:
+                return
+            for row in rows:
+                self._add(row)
+            self.synced_at = max(self.synced_at, max(row["synced_at"] for row in rows))
+
+        self.build_seconds = time.perf_counter() - started
+
+    def _build(self, rows):
+        for row in rows:
+            self._add(row, sort=False)
+        self.prefixes.sort()
+        if rows:
+            self.synced_at = max(row["synced_at"] for row in rows)
@@ -0,0 +1,51 @@
+from typing import Optional
+
+
+class QueueEntry:
+    # only what playback and ..queue need, everything else (lyrics, credits, artwork) is looked up by id when asked for
+    __slots__ = ("id", "name", "path", "length", "category", "era", "from_radio", "start")
+
+    def __init__(
+        self,
+        id: Optional[int],
+        name: str,
+        path: Optional[str],
+        length: Optional[str] = None,
+        category: Optional[str] = None,
+        era: Optional[str] = None,
+        from_radio: bool = False,
+        start: float = 0.0,
+    ):
+        self.id = id
+        self.name = name
+        self.path = path
+        self.length = length
+        self.category = category
+        self.era = era
+        self.from_radio = from_radio
+        # seconds to seek into the track, only set when resuming after a restart
+        self.start = start
+
+    @classmethod
+    def from_song(cls, song: dict, from_radio: bool = False) -> "QueueEntry":
+        era = song.get("era")
+        song_id = song.get("id")
+        return cls(
+            id=int(song_id) if song_id is not None else None,
+            name=song.get("name") or "Unknown",
+            path=song.get("path") or None,
+            length=song.get("length") or None,
+            category=song.get("category") or None,
+            era=era.get("name") if isinstance(era, dict) else None,
+            from_radio=from_radio,
+        )
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "QueueEntry":
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def __repr__(self):
+        return f"<QueueEntry id={self.id} name={self.name!r}>"
@@ -0,0 +1,38 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# main imports this first, so this is as close to process start as we can measure from python
+STARTED = time.perf_counter()
+
+steps = []
+_lock = threading.Lock()
+_reported = False
+
+
+@contextmanager
+def step(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            steps.append((name, time.perf_counter() - start))
+
+
+def report(label: str = "ready"):
+    # printed once, on the first on_ready
+    global _reported
+    if _reported:
+        return
+    _reported = True
+
+    total = time.perf_counter() - STARTED
+    with _lock:
+        done = list(steps)
+
+    width = max([len(name) for name, _ in done] + [len(label)])
+    lines = [f"Startup profile ({label} after {total * 1000:.0f} ms):"]
+    for name, elapsed in done:
+        lines.append(f"  {name:<{width}}  {elapsed * 1000:8.1f} ms")
+    print("\n".join(lines))
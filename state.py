@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config import DATA_DIR
+from songs import QueueEntry
+
+DB_PATH = os.path.join(DATA_DIR, "state.db")
+
+
+class StateStore:
+    # one row per guild with something to resume, rewritten as a whole on every checkpoint.
+    # with cluster.py every worker shares the file and only touches guilds on its own shards
+    def __init__(self, path: str = DB_PATH, shard_ids: Optional[list] = None, shard_count: Optional[int] = None):
+        self.shard_ids = set(shard_ids) if shard_ids and shard_count else None
+        self.shard_count = shard_count
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS players (
+                guild_id INTEGER PRIMARY KEY,
+                voice_channel_id INTEGER NOT NULL,
+                text_channel_id INTEGER,
+                radio INTEGER NOT NULL DEFAULT 0,
+                current TEXT,
+                position REAL NOT NULL DEFAULT 0,
+                queue TEXT NOT NULL DEFAULT '[]',
+                saved_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def owns(self, guild_id: int) -> bool:
+        if self.shard_ids is None:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    def save(self, snapshots: list):
+        now = time.time()
+        rows = [
+            (
+                snap["guild_id"],
+                snap["voice_channel_id"],
+                snap["text_channel_id"],
+                int(bool(snap["radio"])),
+                json.dumps(snap["current"].to_dict()) if snap["current"] else None,
+                snap["position"],
+                json.dumps([entry.to_dict() for entry in snap["queue"]]),
+                now,
+            )
+            for snap in snapshots
+        ]
+
+        with self._lock:
+            with self._conn:
+                if self.shard_ids is None:
+                    self._conn.execute("DELETE FROM players")
+                else:
+                    saved = [row[0] for row in self._conn.execute("SELECT guild_id FROM players")]
+                    self._conn.executemany(
+                        "DELETE FROM players WHERE guild_id = ?",
+                        [(guild_id,) for guild_id in saved if self.owns(guild_id)],
+                    )
+                self._conn.executemany(
+                    "INSERT INTO players (guild_id, voice_channel_id, text_channel_id, radio, current, position, queue, saved_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def load(self, max_age: float) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM players WHERE saved_at >= ?", (time.time() - max_age,)
+            ).fetchall()
+
+        snapshots = []
+        for row in rows:
+            if not self.owns(row["guild_id"]):
+                continue
+            try:
+                current = json.loads(row["current"]) if row["current"] else None
+                snapshots.append({
+                    "guild_id": row["guild_id"],
+                    "voice_channel_id": row["voice_channel_id"],
+                    "text_channel_id": row["text_channel_id"],
+                    "radio": bool(row["radio"]),
+                    "current": QueueEntry.from_dict(current) if current else None,
+                    "position": row["position"],
+                    "queue": [QueueEntry.from_dict(entry) for entry in json.loads(row["queue"])],
+                })
+            except (ValueError, TypeError) as e:
+                print(f"Skipping saved state for guild {row['guild_id']}: {e}")
+        return snapshots
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,49 +1,261 @@
 import sqlite3
 import os
+import threading
+import time
+
+from config import DATA_DIR
+
+DB_PATH = os.path.join(DATA_DIR, "stats.db")
+
+# counters are buffered here and written by a background thread so nothing on the event loop touches sqlite
+_pending = {}
+_pending_plays = []
+_pending_lock = threading.Lock()
+
+_conn = None
+_db_lock = threading.Lock()
+
+_flusher = None
+_stop = threading.Event()
 
-DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stats.db")
 
 def _get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+    return _conn
+
+
+def init(flush_interval=5.0):
+    global _flusher
+
+    with _db_lock:
+        conn = _get_conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS stats (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL DEFAULT 0
+            )
+        """)
+        for key, default in [
+            ("total_tracks_played", 0),
+            ("total_play_time", 0.0),
+            ("total_vc_time", 0.0),
+            ("radio_songs_played", 0),
+        ]:
+            conn.execute(
+                "INSERT OR IGNORE INTO stats (key, value) VALUES (?, ?)",
+                (key, default),
+            )
+
+        # every play is logged once, the rollups are kept up to date as plays are flushed so reads never scan plays
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS plays (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                song_id INTEGER,
+                song_name TEXT,
+                era TEXT,
+                guild_id INTEGER,
+                played_at REAL NOT NULL,
+                duration REAL NOT NULL DEFAULT 0,
+                radio INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_plays_song ON plays (song_id, played_at);
+            CREATE INDEX IF NOT EXISTS idx_plays_guild ON plays (guild_id, played_at);
+            CREATE INDEX IF NOT EXISTS idx_plays_time ON plays (played_at);
+
+            CREATE TABLE IF NOT EXISTS song_plays (
+                song_id INTEGER PRIMARY KEY,
+                song_name TEXT,
+                era TEXT,
+                plays INTEGER NOT NULL DEFAULT 0,
+                play_time REAL NOT NULL DEFAULT 0,
+                last_played REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_song_plays_plays ON song_plays (plays DESC);
+
+            CREATE TABLE IF NOT EXISTS song_daily (
+                day TEXT NOT NULL,
+                song_id INTEGER NOT NULL,
+                plays INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, song_id)
+            );
 
+            CREATE TABLE IF NOT EXISTS daily_plays (
+                day TEXT PRIMARY KEY,
+                plays INTEGER NOT NULL DEFAULT 0,
+                radio_plays INTEGER NOT NULL DEFAULT 0,
+                play_time REAL NOT NULL DEFAULT 0
+            );
 
-def init():
-    conn = _get_conn()
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS stats (
-            key TEXT PRIMARY KEY,
-            value REAL NOT NULL DEFAULT 0
+            CREATE TABLE IF NOT EXISTS guild_plays (
+                guild_id INTEGER PRIMARY KEY,
+                plays INTEGER NOT NULL DEFAULT 0,
+                play_time REAL NOT NULL DEFAULT 0,
+                last_played REAL
+            );
+
+            CREATE TABLE IF NOT EXISTS era_plays (
+                era TEXT PRIMARY KEY,
+                plays INTEGER NOT NULL DEFAULT 0,
+                play_time REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_era_plays_plays ON era_plays (plays DESC);
+        """)
+        conn.commit()
+
+    if _flusher is None or not _flusher.is_alive():
+        _stop.clear()
+        _flusher = threading.Thread(target=_run, args=(flush_interval,), name="stats-flusher", daemon=True)
+        _flusher.start()
+
+
+def _run(interval):
+    while not _stop.wait(interval):
+        flush()
+
+
+def _write_plays(conn, plays):
+    for song_id, song_name, era, guild_id, played_at, duration, radio in plays:
+        day = time.strftime("%Y-%m-%d", time.gmtime(played_at))
+
+        conn.execute(
+            "INSERT INTO plays (song_id, song_name, era, guild_id, played_at, duration, radio) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (song_id, song_name, era, guild_id, played_at, duration, radio),
         )
-    """)
-    for key, default in [
-        ("total_tracks_played", 0),
-        ("total_play_time", 0.0),
-        ("total_vc_time", 0.0),
-        ("radio_songs_played", 0),
-    ]:
+        if song_id is not None:
+            conn.execute(
+                """INSERT INTO song_plays (song_id, song_name, era, plays, play_time, last_played) VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (song_id) DO UPDATE SET
+                    song_name = excluded.song_name, era = excluded.era, plays = plays + 1,
+                    play_time = play_time + excluded.play_time, last_played = excluded.last_played""",
+                (song_id, song_name, era, duration, played_at),
+            )
+            conn.execute(
+                """INSERT INTO song_daily (day, song_id, plays) VALUES (?, ?, 1)
+                ON CONFLICT (day, song_id) DO UPDATE SET plays = plays + 1""",
+                (day, song_id),
+            )
         conn.execute(
-            "INSERT OR IGNORE INTO stats (key, value) VALUES (?, ?)",
-            (key, default),
+            """INSERT INTO daily_plays (day, plays, radio_plays, play_time) VALUES (?, 1, ?, ?)
+            ON CONFLICT (day) DO UPDATE SET
+                plays = plays + 1, radio_plays = radio_plays + excluded.radio_plays, play_time = play_time + excluded.play_time""",
+            (day, radio, duration),
         )
-    conn.commit()
-    conn.close()
+        if guild_id is not None:
+            conn.execute(
+                """INSERT INTO guild_plays (guild_id, plays, play_time, last_played) VALUES (?, 1, ?, ?)
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    plays = plays + 1, play_time = play_time + excluded.play_time, last_played = excluded.last_played""",
+                (guild_id, duration, played_at),
+            )
+        if era:
+            conn.execute(
+                """INSERT INTO era_plays (era, plays, play_time) VALUES (?, 1, ?)
+                ON CONFLICT (era) DO UPDATE SET plays = plays + 1, play_time = play_time + excluded.play_time""",
+                (era, duration),
+            )
+
+
+def flush():
+    global _pending, _pending_plays
+
+    with _db_lock:
+        with _pending_lock:
+            if not _pending and not _pending_plays:
+                return
+            pending, _pending = _pending, {}
+            plays, _pending_plays = _pending_plays, []
+
+        try:
+            conn = _get_conn()
+            with conn:
+                conn.executemany(
+                    "UPDATE stats SET value = value + ? WHERE key = ?",
+                    [(amount, key) for key, amount in pending.items()],
+                )
+                _write_plays(conn, plays)
+        except Exception as e:
+            print(f"Stats flush error: {e}")
+            # put them back so the next flush tries again
+            with _pending_lock:
+                for key, amount in pending.items():
+                    _pending[key] = _pending.get(key, 0) + amount
+                _pending_plays[:0] = plays
+
+
+def shutdown():
+    global _conn
+
+    _stop.set()
+    if _flusher is not None and _flusher is not threading.current_thread():
+        _flusher.join(timeout=5)
+
+    flush()
+    with _db_lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
 
 
 def get_stats():
-    conn = _get_conn()
-    rows = conn.execute("SELECT key, value FROM stats").fetchall()
-    conn.close()
-    return {row["key"]: row["value"] for row in rows}
+    with _db_lock:
+        rows = _get_conn().execute("SELECT key, value FROM stats").fetchall()
+    result = {row["key"]: row["value"] for row in rows}
+
+    with _pending_lock:
+        for key, amount in _pending.items():
+            result[key] = result.get(key, 0) + amount
+    return result
 
 
 def increment(key, amount=1):
-    conn = _get_conn()
-    conn.execute("UPDATE stats SET value = value + ? WHERE key = ?", (amount, key))
-    conn.commit()
-    conn.close()
+    with _pending_lock:
+        _pending[key] = _pending.get(key, 0) + amount
 
 
 def add_time(key, seconds):
     increment(key, seconds)
+
+
+def record_play(song_id, song_name, era, guild_id, played_at, duration, radio=False):
+    with _pending_lock:
+        _pending_plays.append((song_id, song_name, era, guild_id, played_at, duration, int(bool(radio))))
+
+
+def _read(sql, params=()):
+    with _db_lock:
+        return [dict(row) for row in _get_conn().execute(sql, params).fetchall()]
+
+
+def top_songs(limit=10, days=None):
+    if days is None:
+        return _read(
+            "SELECT song_id, song_name, era, plays, play_time FROM song_plays ORDER BY plays DESC LIMIT ?",
+            (limit,),
+        )
+
+    since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+    return _read(
+        """SELECT d.song_id, s.song_name, s.era, SUM(d.plays) AS plays FROM song_daily d
+        LEFT JOIN song_plays s ON s.song_id = d.song_id
+        WHERE d.day > ? GROUP BY d.song_id ORDER BY plays DESC LIMIT ?""",
+        (since, limit),
+    )
+
+
+def top_eras(limit=10):
+    return _read("SELECT era, plays, play_time FROM era_plays ORDER BY plays DESC LIMIT ?", (limit,))
+
+
+def guild_stats(guild_id):
+    rows = _read("SELECT plays, play_time, last_played FROM guild_plays WHERE guild_id = ?", (guild_id,))
+    return rows[0] if rows else None
+
+
+def daily_plays(days=7):
+    since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+    return _read("SELECT day, plays, radio_plays, play_time FROM daily_plays WHERE day > ? ORDER BY day", (since,))
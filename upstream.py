@@ -0,0 +1,174 @@
+import asyncio
+import random
+import time
+from typing import Optional
+from urllib.parse import quote
+
+import aiohttp
+
+import metrics
+from config import API_URL
+
+SONGS_URL = f"{API_URL}/songs/"
+DOWNLOAD_URL = f"{API_URL}/files/download/"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def endpoint(url: str) -> str:
+    if url.startswith(DOWNLOAD_URL):
+        return "download"
+    if url.startswith(SONGS_URL) and url != SONGS_URL:
+        return "song"
+    return "songs"
+
+
+def download_url(path: str) -> str:
+    return f"{DOWNLOAD_URL}?path={quote(path)}"
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = 5, cooldown: float = 30, max_cooldown: float = 600):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if self.is_open() else "half-open"
+
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0
+        return max(0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.cooldown = self.base_cooldown
+
+    def failure(self):
+        self.failures += 1
+        if self.opened_at is not None and not self.is_open():
+            # the half-open probe failed too, back off harder
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self.opened_at = time.monotonic()
+            self.trips += 1
+        elif self.opened_at is None and self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+
+class UpstreamClient:
+    def __init__(
+        self,
+        timeout: float = 10,
+        connect_timeout: float = 4,
+        retries: int = 3,
+        backoff: float = 0.25,
+        max_backoff: float = 4,
+        limit: int = 100,
+        limit_per_host: int = 32,
+    ):
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        # downloads can take as long as they need, they just can't stall
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=30)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+
+        self.breaker = CircuitBreaker()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._inflight: dict[tuple, asyncio.Task] = {}
+
+        self.requests = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if not self.session or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    def _delay(self, attempt: int) -> float:
+        # full jitter so a burst of retries doesn't land on the api at the same moment
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def get_json(self, url: str, params: dict = None):
+        key = (url, tuple(sorted((params or {}).items())))
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._get_json(url, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+
+        # shield so one caller giving up doesn't cancel the request for everyone else waiting on it
+        data = await asyncio.shield(task)
+        return dict(data) if isinstance(data, dict) else data
+
+    def _done(self, key: tuple, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def _get_json(self, url: str, params: dict = None):
+        session = await self.get_session()
+        error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self._delay(attempt - 1))
+
+            self.requests += 1
+            name = endpoint(url)
+            start = time.perf_counter()
+            try:
+                async with session.get(url, params=params) as resp:
+                    metrics.upstream_responses_total.inc(endpoint=name, status=resp.status)
+                    metrics.upstream_request_seconds.observe(time.perf_counter() - start, endpoint=name)
+                    if resp.status not in RETRY_STATUSES:
+                        self.breaker.success()
+                    if resp.status == 200:
+                        return await resp.json()
+                    if resp.status not in RETRY_STATUSES:
+                        return None
+                    error = UpstreamError(f"{url} returned {resp.status}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                metrics.upstream_responses_total.inc(endpoint=name, status="error")
+                error = e
+
+        self.failures += 1
+        self.breaker.failure()
+        raise UpstreamError(f"{url} failed after {self.retries + 1} attempts: {error}")
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self.session and not self.session.closed:
+            await self.session.close()